@@ -0,0 +1,169 @@
+import json
+import os
+
+from datetime import date
+
+import numpy as np
+
+from analytics.snapshot import SNAPSHOT_DIR
+
+
+class Snapshot:
+    """Снимок данных, открытый через memory-mapped колонки NumPy"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self._columns = {}
+
+    @property
+    def created_at(self) -> float:
+        return self.meta['created_at']
+
+    def rows(self, table: str) -> int:
+        return self.meta['tables'][table]['rows']
+
+    def vocab(self, table: str, column: str) -> list:
+        return self.meta['tables'][table]['vocabs'][column]
+
+    def column(self, table: str, column: str) -> np.ndarray:
+        key = (table, column)
+        if key not in self._columns:
+            rows = self.rows(table)
+            if rows == 0:
+                array = np.empty(0, dtype=self.meta['tables'][table]['columns'][column])
+            else:
+                array = np.memmap(
+                    os.path.join(self.path, f'{table}.{column}.bin'),
+                    dtype=self.meta['tables'][table]['columns'][column],
+                    mode='r',
+                    shape=(rows,),
+                )
+            self._columns[key] = array
+        return self._columns[key]
+
+
+_opened: Snapshot | None = None
+
+
+def load_latest(snapshot_dir: str = SNAPSHOT_DIR) -> Snapshot | None:
+    """Открывает последний опубликованный снимок (или None, если его нет)"""
+    global _opened
+
+    try:
+        with open(os.path.join(snapshot_dir, 'LATEST')) as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+
+    if _opened is None or _opened.name != name:
+        _opened = Snapshot(os.path.join(snapshot_dir, name))
+    return _opened
+
+
+def _window(snapshot: Snapshot, table: str, date_column: str, days: int) -> np.ndarray:
+    since = date.today().toordinal() - days + 1
+    return snapshot.column(table, date_column) >= since
+
+
+def _grouped_mean(codes: np.ndarray, values: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    sums = np.bincount(codes, weights=values, minlength=len(counts))
+    return np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+
+def intake_by_city(snapshot: Snapshot, days: int = 30, limit: int = 10) -> list[dict]:
+    """Средние потребление и цели по воде и калориям в разрезе городов"""
+    mask = _window(snapshot, 'daily_stats', 'stat_date', days)
+    cities = snapshot.column('daily_stats', 'city')[mask]
+    vocab = snapshot.vocab('daily_stats', 'city')
+
+    counts = np.bincount(cities, minlength=len(vocab)).astype('float64')
+    means = {
+        col: _grouped_mean(cities, snapshot.column('daily_stats', col)[mask], counts)
+        for col in ('total_water', 'water_goal', 'total_calories', 'calorie_goal')
+    }
+
+    top = np.argsort(counts)[::-1][:limit]
+    return [
+        {
+            'city': vocab[code] or '—',
+            'days': int(counts[code]),
+            **{col: float(values[code]) for col, values in means.items()},
+        }
+        for code in top
+        if counts[code] > 0
+    ]
+
+
+def goal_attainment(snapshot: Snapshot, days: int = 30) -> dict:
+    """Доля дней, в которые пользователи выполнили норму воды и уложились в калории"""
+    mask = _window(snapshot, 'daily_stats', 'stat_date', days)
+    water = snapshot.column('daily_stats', 'total_water')[mask]
+    water_goal = snapshot.column('daily_stats', 'water_goal')[mask]
+    calories = snapshot.column('daily_stats', 'total_calories')[mask]
+    calorie_goal = snapshot.column('daily_stats', 'calorie_goal')[mask]
+
+    has_water_goal = water_goal > 0
+    has_calories = (calories > 0) & (calorie_goal > 0)
+
+    water_days = int(np.count_nonzero(has_water_goal))
+    calorie_days = int(np.count_nonzero(has_calories))
+
+    return {
+        'days': int(np.count_nonzero(mask)),
+        'water_rate': np.count_nonzero(has_water_goal & (water >= water_goal)) / water_days if water_days else 0.0,
+        'calorie_rate': np.count_nonzero(has_calories & (calories <= calorie_goal)) / calorie_days if calorie_days else 0.0,
+    }
+
+
+def _top_codes(table: str, column: str, snapshot: Snapshot, days: int, limit: int, weights: dict) -> list[dict]:
+    mask = _window(snapshot, table, 'log_date', days)
+    codes = snapshot.column(table, column)[mask]
+    vocab = snapshot.vocab(table, column)
+
+    counts = np.bincount(codes, minlength=len(vocab))
+    sums = {
+        key: np.bincount(codes, weights=snapshot.column(table, col)[mask], minlength=len(vocab))
+        for key, col in weights.items()
+    }
+
+    if len(counts) > limit:
+        top = np.argpartition(counts, -limit)[-limit:]
+    else:
+        top = np.arange(len(counts))
+    top = top[np.argsort(counts[top])[::-1]]
+
+    return [
+        {
+            'name': vocab[code],
+            'count': int(counts[code]),
+            **{key: float(values[code]) for key, values in sums.items()},
+        }
+        for code in top
+        if counts[code] > 0
+    ]
+
+
+def popular_foods(snapshot: Snapshot, days: int = 30, limit: int = 10) -> list[dict]:
+    """Самые часто записываемые продукты"""
+    return _top_codes('food_logs', 'food_name', snapshot, days, limit, {'calories': 'calories'})
+
+
+def popular_workouts(snapshot: Snapshot, days: int = 30, limit: int = 10) -> list[dict]:
+    """Самые популярные типы тренировок"""
+    return _top_codes(
+        'workout_logs', 'workout_type', snapshot, days, limit,
+        {'duration': 'duration', 'calories_burned': 'calories_burned'},
+    )
+
+
+def build_report(snapshot: Snapshot, days: int = 30) -> dict:
+    """Считает все отчёты для /admin_stats по одному снимку"""
+    return {
+        'cities': intake_by_city(snapshot, days),
+        'attainment': goal_attainment(snapshot, days),
+        'foods': popular_foods(snapshot, days),
+        'workouts': popular_workouts(snapshot, days),
+    }
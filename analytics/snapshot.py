@@ -0,0 +1,261 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+
+from database.engine import engine
+
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', 'snapshots')
+SNAPSHOT_INTERVAL = int(os.getenv('SNAPSHOT_INTERVAL', 3600))
+SNAPSHOT_KEEP = 2
+
+# Размер пачки строк: каждая пачка читается отдельным запросом,
+# поэтому блокировка чтения на живой БД держится недолго
+CHUNK_SIZE = 50_000
+
+# Выгрузки по расписанию и по /admin_snapshot пишут LATEST.tmp и чистят
+# старые снимки, поэтому выполняются по одной
+_lock = asyncio.Lock()
+
+# Описание выгружаемых таблиц: имя -> (FROM, первичный ключ, колонки).
+# Колонка — (имя, тип, SQL-выражение). Строковые колонки (тип 'code')
+# кодируются словарём в int32, даты ('date') — в номер дня (date.toordinal).
+TABLES = {
+    'daily_stats': (
+        'daily_stats d LEFT JOIN users u ON u.id = d.user_id',
+        'd.id',
+        [
+            ('user_id', 'int32', 'd.user_id'),
+            ('stat_date', 'date', 'd.stat_date'),
+            ('total_water', 'float32', 'd.total_water'),
+            ('water_goal', 'float32', 'd.water_goal'),
+            ('total_calories', 'float32', 'd.total_calories'),
+            ('burned_calories', 'float32', 'd.burned_calories'),
+            ('calorie_goal', 'float32', 'd.calorie_goal'),
+            ('city', 'code', 'u.city'),
+        ],
+    ),
+    'food_logs': (
+        'food_logs f',
+        'f.id',
+        [
+            ('user_id', 'int32', 'f.user_id'),
+            ('log_date', 'date', 'f.log_date'),
+            ('food_name', 'code', 'f.food_name'),
+            ('calories', 'float32', 'f.calories'),
+            ('amount', 'float32', 'f.amount'),
+        ],
+    ),
+    'workout_logs': (
+        'workout_logs w',
+        'w.id',
+        [
+            ('user_id', 'int32', 'w.user_id'),
+            ('log_date', 'date', 'w.log_date'),
+            ('workout_type', 'code', 'w.workout_type'),
+            ('duration', 'float32', 'w.duration'),
+            ('calories_burned', 'float32', 'w.calories_burned'),
+        ],
+    ),
+}
+
+# julianday('0001-01-01') - 1721424.5 == date(1, 1, 1).toordinal() == 1
+_ORDINAL = 'COALESCE(CAST(julianday({}) - 1721424.5 AS INTEGER), 0)'
+
+
+def _vocab_table(name: str, col: str) -> str:
+    return f'temp.vocab_{name}_{col}'
+
+
+def _chunk_query(name: str) -> str:
+    """
+    Запрос пачки, в котором все колонки уже числа.
+
+    Строки кодируются через временную таблицу словаря (исходное значение →
+    код); значения, которых в ней ещё нет, получают код -1 и дописываются
+    в словарь в Python.
+    """
+    source, key, columns = TABLES[name]
+    exprs = [key]
+    for col, kind, expr in columns:
+        if kind == 'date':
+            exprs.append(_ORDINAL.format(expr))
+        elif kind == 'code':
+            exprs.append(f'COALESCE(v_{col}.code, -1)')
+            source += f" LEFT JOIN {_vocab_table(name, col)} v_{col} ON v_{col}.value = COALESCE({expr}, '')"
+        else:
+            exprs.append(f'COALESCE({expr}, 0)')
+    return f"SELECT {', '.join(exprs)} FROM {source} WHERE {key} > ? ORDER BY {key} LIMIT ?"
+
+
+def _add_to_vocab(conn: sqlite3.Connection, name: str, col: str, values: list, vocab: dict) -> dict:
+    """Кодирует новые исходные значения и дописывает их во временную таблицу словаря"""
+    codes = {}
+    for value in values:
+        key = (value or '').strip().lower()
+        code = vocab.get(key)
+        if code is None:
+            code = vocab[key] = len(vocab)
+        codes[value or ''] = code
+    conn.executemany(f'INSERT OR IGNORE INTO {_vocab_table(name, col)} VALUES (?, ?)', codes.items())
+    return codes
+
+
+def _export_table(conn: sqlite3.Connection, target: str, name: str) -> dict:
+    """Выгружает таблицу пачками в бинарные файлы по колонкам"""
+    import numpy as np
+
+    source, key, columns = TABLES[name]
+    vocabs = {col: {} for col, kind, _ in columns if kind == 'code'}
+    for col in vocabs:
+        conn.execute(f'CREATE TABLE {_vocab_table(name, col)} (value TEXT PRIMARY KEY, code INTEGER NOT NULL)')
+    query = _chunk_query(name)
+    width = len(columns) + 1
+
+    files = {
+        col: open(os.path.join(target, f'{name}.{col}.bin'), 'wb')
+        for col, _, _ in columns
+    }
+    rows_total = 0
+    last_id = 0
+
+    try:
+        while True:
+            rows = conn.execute(query, (last_id, CHUNK_SIZE)).fetchall()
+            if not rows:
+                break
+
+            # Все значения числовые: один проход fromiter вместо преобразования по строкам.
+            # float64 точно хранит целые до 2**53
+            data = np.fromiter(
+                itertools.chain.from_iterable(rows), dtype='float64', count=len(rows) * width
+            ).reshape(len(rows), width)
+            ids = data[:, 0].astype('int64')
+            last_id = int(ids[-1])
+            rows_total += len(rows)
+
+            for i, (col, kind, expr) in enumerate(columns, start=1):
+                values = data[:, i]
+                if kind == 'code':
+                    values = _fill_new_codes(conn, name, col, expr, ids, values, vocabs[col])
+                values.astype('int32' if kind in ('code', 'date') else kind).tofile(files[col])
+    finally:
+        for f in files.values():
+            f.close()
+        for col in vocabs:
+            conn.execute(f'DROP TABLE {_vocab_table(name, col)}')
+
+    return {
+        'rows': rows_total,
+        'columns': {col: ('int32' if kind in ('code', 'date') else kind) for col, kind, _ in columns},
+        'vocabs': {col: list(vocab) for col, vocab in vocabs.items()},
+    }
+
+
+def _fill_new_codes(conn, name: str, col: str, expr: str, ids, values, vocab: dict):
+    """Досчитывает коды строк, чьих значений не было в словаре (-1)"""
+    import numpy as np
+
+    missing = np.flatnonzero(values < 0)
+    if not len(missing):
+        return values
+
+    source, key, _ = TABLES[name]
+    raw = {}
+    missing_ids = ids[missing].tolist()
+    # Ограничение SQLite на число параметров запроса
+    for start in range(0, len(missing_ids), 900):
+        batch = missing_ids[start:start + 900]
+        raw.update(conn.execute(
+            f"SELECT {key}, {expr} FROM {source} WHERE {key} IN ({', '.join('?' * len(batch))})", batch
+        ).fetchall())
+    # Коды выдаются в порядке первого появления, как при построчном кодировании
+    codes = _add_to_vocab(conn, name, col, list(dict.fromkeys(raw[row_id] for row_id in missing_ids)), vocab)
+    values = values.copy()
+    values[missing] = [codes[raw[row_id] or ''] for row_id in missing_ids]
+    return values
+
+
+def export_snapshot(db_path: str | None = None, snapshot_dir: str = SNAPSHOT_DIR) -> str:
+    """
+    Выгружает DailyStats, FoodLog и WorkoutLog в колоночные файлы NumPy.
+
+    Снимок пишется во временный каталог, после чего атомарно
+    публикуется через файл LATEST. Старые снимки удаляются.
+
+    Returns:
+        Путь к каталогу нового снимка
+    """
+    db_path = db_path or engine.url.database
+    started = time.perf_counter()
+    now = time.time()
+    name = time.strftime('%Y%m%d-%H%M%S', time.localtime(now)) + f'-{int(now * 1000) % 1000:03d}'
+    target = os.path.join(snapshot_dir, name)
+    tmp_target = target + '.tmp'
+    os.makedirs(tmp_target, exist_ok=True)
+
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        meta = {
+            'created_at': now,
+            'tables': {table: _export_table(conn, tmp_target, table) for table in TABLES},
+        }
+    finally:
+        conn.close()
+
+    with open(os.path.join(tmp_target, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    os.replace(tmp_target, target)
+
+    latest_tmp = os.path.join(snapshot_dir, 'LATEST.tmp')
+    with open(latest_tmp, 'w') as f:
+        f.write(name)
+    os.replace(latest_tmp, os.path.join(snapshot_dir, 'LATEST'))
+
+    snapshots = sorted(
+        d for d in os.listdir(snapshot_dir)
+        if os.path.isdir(os.path.join(snapshot_dir, d)) and not d.endswith('.tmp')
+    )
+    for old in snapshots[:-SNAPSHOT_KEEP]:
+        shutil.rmtree(os.path.join(snapshot_dir, old), ignore_errors=True)
+
+    logging.info(
+        'Snapshot %s exported in %.2fs (%s)',
+        name,
+        time.perf_counter() - started,
+        ', '.join(f"{t}: {m['rows']} rows" for t, m in meta['tables'].items()),
+    )
+    return target
+
+
+def is_running() -> bool:
+    return _lock.locked()
+
+
+async def run_export() -> str:
+    """Выгружает снимок в отдельном потоке; параллельная выгрузка ждёт завершения текущей"""
+    async with _lock:
+        return await asyncio.to_thread(export_snapshot)
+
+
+async def snapshot_loop(interval: int = SNAPSHOT_INTERVAL):
+    """Периодически обновляет снимок в отдельном потоке"""
+    # Свежий снимок с прошлого запуска обновляем по расписанию, а не на старте
+    try:
+        age = time.time() - os.path.getmtime(os.path.join(SNAPSHOT_DIR, 'LATEST'))
+    except OSError:
+        age = interval
+    if age < interval:
+        await asyncio.sleep(interval - age)
+
+    while True:
+        try:
+            await run_export()
+        except Exception:
+            logging.exception('Snapshot export failed')
+        await asyncio.sleep(interval)
@@ -1,7 +1,12 @@
+import os
+
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 
-DATABASE_URL = "sqlite+aiosqlite:///database.db"
+from services import metrics
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///database.db")
 
 engine = create_async_engine(
     DATABASE_URL,
@@ -10,11 +15,31 @@ engine = create_async_engine(
     pool_pre_ping=True,
 )
 
+
+@event.listens_for(engine.sync_engine, 'connect')
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL: читатели (снимки аналитики, бэкап) не блокируют писателей
+    if engine.dialect.name != 'sqlite':
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+
+@event.listens_for(engine.sync_engine, 'checkout')
+def _count_checkout(*args):
+    metrics.inc('db_checkouts_total')
+
+
 session_maker = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
 
 Base = declarative_base()
 
-async def init_db():
+async def init_db() -> int:
+    """Приводит схему БД к последней версии, возвращает версию до миграции"""
+    from database.migrations import migrate
+
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        return await migrate(conn)
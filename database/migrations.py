@@ -0,0 +1,221 @@
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# Схема версии 1 в том виде, в каком она вышла: миграции не зависят от текущих
+# моделей, изменения моделей оформляются следующими миграциями.
+# IF NOT EXISTS: базы, созданные до появления версий, получают только недостающее.
+SCHEMA_V1 = [
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER NOT NULL,
+        telegram_id INTEGER NOT NULL,
+        username VARCHAR,
+        weight FLOAT,
+        height INTEGER,
+        age INTEGER,
+        gender VARCHAR,
+        activity_minutes INTEGER,
+        city VARCHAR,
+        water_goal INTEGER,
+        calorie_goal INTEGER,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME,
+        PRIMARY KEY (id)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS ix_users_id ON users (id)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS ix_users_telegram_id ON users (telegram_id)',
+    '''
+    CREATE TABLE IF NOT EXISTS water_logs (
+        id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        amount INTEGER NOT NULL,
+        logged_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        log_date DATE DEFAULT CURRENT_DATE,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS ix_water_logs_id ON water_logs (id)',
+    'CREATE INDEX IF NOT EXISTS ix_water_logs_log_date ON water_logs (log_date)',
+    '''
+    CREATE TABLE IF NOT EXISTS food_logs (
+        id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        food_name VARCHAR NOT NULL,
+        calories FLOAT NOT NULL,
+        amount FLOAT,
+        protein FLOAT,
+        fat FLOAT,
+        carbs FLOAT,
+        logged_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        log_date DATE DEFAULT CURRENT_DATE,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS ix_food_logs_id ON food_logs (id)',
+    'CREATE INDEX IF NOT EXISTS ix_food_logs_log_date ON food_logs (log_date)',
+    '''
+    CREATE TABLE IF NOT EXISTS workout_logs (
+        id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        workout_type VARCHAR NOT NULL,
+        duration INTEGER NOT NULL,
+        calories_burned FLOAT NOT NULL,
+        water_needed INTEGER,
+        logged_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        log_date DATE DEFAULT CURRENT_DATE,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS ix_workout_logs_id ON workout_logs (id)',
+    'CREATE INDEX IF NOT EXISTS ix_workout_logs_log_date ON workout_logs (log_date)',
+    '''
+    CREATE TABLE IF NOT EXISTS daily_stats (
+        id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        stat_date DATE NOT NULL,
+        total_water INTEGER,
+        water_goal INTEGER,
+        total_calories FLOAT,
+        burned_calories FLOAT,
+        calorie_goal INTEGER,
+        total_protein FLOAT,
+        total_fat FLOAT,
+        total_carbs FLOAT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS ix_daily_stats_id ON daily_stats (id)',
+    'CREATE INDEX IF NOT EXISTS ix_daily_stats_stat_date ON daily_stats (stat_date)',
+    '''
+    CREATE TABLE IF NOT EXISTS bot_state (
+        "key" VARCHAR NOT NULL,
+        value INTEGER NOT NULL,
+        PRIMARY KEY ("key")
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS challenges (
+        id INTEGER NOT NULL,
+        chat_id INTEGER NOT NULL,
+        metric VARCHAR NOT NULL,
+        week_start DATE NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS ix_challenges_chat_id ON challenges (chat_id)',
+    'CREATE INDEX IF NOT EXISTS ix_challenges_id ON challenges (id)',
+    'CREATE INDEX IF NOT EXISTS ix_challenges_week_start ON challenges (week_start)',
+    '''
+    CREATE TABLE IF NOT EXISTS challenge_members (
+        id INTEGER NOT NULL,
+        challenge_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        name VARCHAR,
+        score FLOAT NOT NULL,
+        joined_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id),
+        UNIQUE (challenge_id, user_id),
+        FOREIGN KEY(challenge_id) REFERENCES challenges (id),
+        FOREIGN KEY(user_id) REFERENCES users (id)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS ix_challenge_members_challenge_id ON challenge_members (challenge_id)',
+    'CREATE INDEX IF NOT EXISTS ix_challenge_members_id ON challenge_members (id)',
+    'CREATE INDEX IF NOT EXISTS ix_challenge_members_user_id ON challenge_members (user_id)',
+    '''
+    CREATE TABLE IF NOT EXISTS products (
+        barcode VARCHAR NOT NULL,
+        product_name VARCHAR NOT NULL,
+        calories_per_100g FLOAT NOT NULL,
+        protein FLOAT,
+        fat FLOAT,
+        carbs FLOAT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (barcode)
+    )
+    ''',
+]
+
+
+def _initial_schema(conn) -> None:
+    for statement in SCHEMA_V1:
+        conn.exec_driver_sql(statement)
+
+
+def _unique_weekly_challenge(conn) -> None:
+    # Дубликаты от одновременных /challenge_start: остаётся самый ранний челлендж,
+    # участники дубликатов переносятся в него (кроме уже состоящих в нём)
+    keep = 'SELECT MIN(id) FROM challenges GROUP BY chat_id, week_start'
+    conn.exec_driver_sql(f'''
+        UPDATE OR IGNORE challenge_members SET challenge_id = (
+            SELECT MIN(k.id) FROM challenges k JOIN challenges c
+            ON k.chat_id = c.chat_id AND k.week_start = c.week_start
+            WHERE c.id = challenge_members.challenge_id
+        )
+        WHERE challenge_id NOT IN ({keep})
+    ''')
+    conn.exec_driver_sql(f'DELETE FROM challenge_members WHERE challenge_id NOT IN ({keep})')
+    conn.exec_driver_sql(f'DELETE FROM challenges WHERE id NOT IN ({keep})')
+    conn.exec_driver_sql(
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_challenges_chat_id_week_start ON challenges (chat_id, week_start)'
+    )
+
+
+# Упорядоченный список миграций: (версия, функция над синхронным соединением).
+# Новые изменения схемы добавляются в конец со следующим номером.
+MIGRATIONS = [
+    (1, _initial_schema),
+    (2, _unique_weekly_challenge),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+async def get_schema_version(conn: AsyncConnection) -> int | None:
+    """Текущая версия схемы или None, если таблицы schema_version ещё нет"""
+    exists = await conn.scalar(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ))
+    if not exists:
+        return None
+    return await conn.scalar(text('SELECT version FROM schema_version'))
+
+
+async def migrate(conn: AsyncConnection) -> int:
+    """
+    Применяет недостающие миграции.
+
+    Если версия схемы совпадает с последней, никакой DDL не выполняется —
+    это один запрос к sqlite_master и один к schema_version.
+
+    Returns:
+        Версия схемы до миграции (0 для новой БД)
+    """
+    version = await get_schema_version(conn)
+    if version == SCHEMA_VERSION:
+        return version
+
+    if version is None:
+        await conn.execute(text('CREATE TABLE schema_version (version INTEGER NOT NULL)'))
+        await conn.execute(text('INSERT INTO schema_version (version) VALUES (0)'))
+        version = 0
+
+    start = version
+    for number, migration in MIGRATIONS:
+        if number > version:
+            logging.info('Applying schema migration %d', number)
+            await conn.run_sync(migration)
+            version = number
+
+    await conn.execute(text('UPDATE schema_version SET version = :version'), {'version': version})
+    return start
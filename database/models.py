@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Date, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -107,3 +107,58 @@ class DailyStats(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     user = relationship("User", back_populates="daily_stats")
+
+
+class BotState(Base):
+    """Служебные значения бота (например, последний обработанный update_id)"""
+    __tablename__ = "bot_state"
+
+    key = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False)
+
+
+class Challenge(Base):
+    """Недельный челлендж группового чата"""
+    __tablename__ = "challenges"
+    # Уникальный индекс, а не UNIQUE в таблице: в SQLite его можно добавить миграцией без пересоздания
+    __table_args__ = (Index("uq_challenges_chat_id_week_start", "chat_id", "week_start", unique=True),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    chat_id = Column(Integer, nullable=False, index=True)
+    metric = Column(String, nullable=False)
+    week_start = Column(Date, nullable=False, index=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    members = relationship("ChallengeMember", back_populates="challenge", cascade="all, delete-orphan")
+
+
+class ChallengeMember(Base):
+    """Участник челленджа и его текущий счёт"""
+    __tablename__ = "challenge_members"
+    __table_args__ = (UniqueConstraint("challenge_id", "user_id"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    challenge_id = Column(Integer, ForeignKey("challenges.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+
+    name = Column(String, nullable=True)
+    score = Column(Float, default=0, nullable=False)
+
+    joined_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    challenge = relationship("Challenge", back_populates="members")
+
+
+class Product(Base):
+    """Локальный индекс продуктов по штрихкоду (значения на 100 г)"""
+    __tablename__ = "products"
+
+    barcode = Column(String, primary_key=True)
+    product_name = Column(String, nullable=False)
+    calories_per_100g = Column(Float, nullable=False)
+    protein = Column(Float, default=0)
+    fat = Column(Float, default=0)
+    carbs = Column(Float, default=0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
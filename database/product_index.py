@@ -0,0 +1,66 @@
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+
+from database.models import Product
+
+products = Product.__table__
+
+
+class ProductIndex:
+    """
+    Индекс штрихкод → пищевая ценность на 100 г.
+
+    Целиком держится в памяти (поиск за O(1)), источник — таблица products.
+    Пополняется ответами OpenFoodFacts при промахе.
+    """
+
+    def __init__(self):
+        self._items: dict[str, dict] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    async def load(self, session_pool: async_sessionmaker[AsyncSession]) -> None:
+        async with session_pool() as session:
+            result = await session.execute(
+                select(
+                    products.c.barcode,
+                    products.c.product_name,
+                    products.c.calories_per_100g,
+                    products.c.protein,
+                    products.c.fat,
+                    products.c.carbs,
+                )
+            )
+            self._items = {
+                row.barcode: {
+                    'food_name': row.product_name,
+                    'calories_per_100g': row.calories_per_100g,
+                    'protein': row.protein or 0,
+                    'fat': row.fat or 0,
+                    'carbs': row.carbs or 0,
+                }
+                for row in result
+            }
+
+    def get(self, barcode: str) -> dict | None:
+        return self._items.get(barcode)
+
+    async def add(self, session: AsyncSession, barcode: str, food: dict) -> None:
+        await session.execute(
+            insert(products)
+            .values(
+                barcode=barcode,
+                product_name=food['food_name'],
+                calories_per_100g=food['calories_per_100g'],
+                protein=food['protein'],
+                fat=food['fat'],
+                carbs=food['carbs'],
+            )
+            .on_conflict_do_nothing(index_elements=['barcode'])
+        )
+        session.after_commit(lambda: self._items.__setitem__(barcode, food))
+
+
+product_index = ProductIndex()
@@ -0,0 +1,175 @@
+from datetime import date
+
+from sqlalchemy import Row, bindparam, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import User, WaterLog, FoodLog, WorkoutLog, DailyStats
+
+# Быстрый путь для горячих хэндлеров на SQLAlchemy Core: без identity map
+# и unit of work, выбираются только нужные колонки. Выражения собраны один
+# раз на уровне модуля над таблицами (а не ORM-классами), поэтому сессия
+# исполняет их как обычный Core, а скомпилированный SQL берётся из кэша движка.
+
+users = User.__table__
+water_logs = WaterLog.__table__
+food_logs = FoodLog.__table__
+workout_logs = WorkoutLog.__table__
+daily_stats = DailyStats.__table__
+
+STATS_COLUMNS = (
+    daily_stats.c.user_id,
+    daily_stats.c.stat_date,
+    daily_stats.c.total_water,
+    daily_stats.c.water_goal,
+    daily_stats.c.total_calories,
+    daily_stats.c.burned_calories,
+    daily_stats.c.calorie_goal,
+    daily_stats.c.total_protein,
+    daily_stats.c.total_fat,
+    daily_stats.c.total_carbs,
+)
+
+_select_user = select(users.c.id, users.c.weight).where(users.c.telegram_id == bindparam('b_telegram_id'))
+
+_insert_water = insert(water_logs)
+_insert_food = insert(food_logs)
+_insert_workout = insert(workout_logs)
+
+_select_stats = (
+    select(*STATS_COLUMNS)
+    .where(daily_stats.c.user_id == bindparam('b_user_id'), daily_stats.c.stat_date == bindparam('b_date'))
+    .limit(1)
+)
+
+_update_stats = (
+    update(daily_stats)
+    .where(daily_stats.c.user_id == bindparam('b_user_id'), daily_stats.c.stat_date == bindparam('b_date'))
+    .values(
+        total_water=daily_stats.c.total_water + bindparam('d_water'),
+        water_goal=daily_stats.c.water_goal + bindparam('d_water_goal'),
+        total_calories=daily_stats.c.total_calories + bindparam('d_calories'),
+        burned_calories=daily_stats.c.burned_calories + bindparam('d_burned'),
+        total_protein=daily_stats.c.total_protein + bindparam('d_protein'),
+        total_fat=daily_stats.c.total_fat + bindparam('d_fat'),
+        total_carbs=daily_stats.c.total_carbs + bindparam('d_carbs'),
+    )
+    .returning(*STATS_COLUMNS)
+)
+
+
+def _goal(column):
+    return func.coalesce(
+        select(column).where(users.c.id == bindparam('b_user_id')).scalar_subquery(), 0
+    )
+
+
+_insert_stats = (
+    insert(daily_stats)
+    .values(
+        user_id=bindparam('b_user_id'),
+        stat_date=bindparam('b_date'),
+        total_water=bindparam('d_water'),
+        water_goal=_goal(users.c.water_goal) + bindparam('d_water_goal'),
+        total_calories=bindparam('d_calories'),
+        burned_calories=bindparam('d_burned'),
+        calorie_goal=_goal(users.c.calorie_goal),
+        total_protein=bindparam('d_protein'),
+        total_fat=bindparam('d_fat'),
+        total_carbs=bindparam('d_carbs'),
+    )
+    .returning(*STATS_COLUMNS)
+)
+
+
+async def get_user_brief(session: AsyncSession, telegram_id: int) -> Row | None:
+    """id и вес пользователя по telegram_id (или None, если профиля нет)"""
+    result = await session.execute(_select_user, {'b_telegram_id': telegram_id})
+    return result.first()
+
+
+async def add_water_log(session: AsyncSession, user_id: int, amount: int, log_date: date) -> None:
+    await session.execute(_insert_water, {'user_id': user_id, 'amount': amount, 'log_date': log_date})
+
+
+async def add_food_log(
+    session: AsyncSession,
+    user_id: int,
+    food_name: str,
+    calories: float,
+    amount: float,
+    protein: float,
+    fat: float,
+    carbs: float,
+    log_date: date,
+) -> None:
+    await session.execute(_insert_food, {
+        'user_id': user_id,
+        'food_name': food_name,
+        'calories': calories,
+        'amount': amount,
+        'protein': protein,
+        'fat': fat,
+        'carbs': carbs,
+        'log_date': log_date,
+    })
+
+
+async def add_workout_log(
+    session: AsyncSession,
+    user_id: int,
+    workout_type: str,
+    duration: int,
+    calories_burned: float,
+    water_needed: int,
+    log_date: date,
+) -> None:
+    await session.execute(_insert_workout, {
+        'user_id': user_id,
+        'workout_type': workout_type,
+        'duration': duration,
+        'calories_burned': calories_burned,
+        'water_needed': water_needed,
+        'log_date': log_date,
+    })
+
+
+async def get_daily_stats(session: AsyncSession, user_id: int, stat_date: date) -> Row | None:
+    result = await session.execute(_select_stats, {'b_user_id': user_id, 'b_date': stat_date})
+    return result.first()
+
+
+async def add_to_daily_stats(
+    session: AsyncSession,
+    user_id: int,
+    stat_date: date,
+    water: int = 0,
+    water_goal: int = 0,
+    calories: float = 0,
+    burned: float = 0,
+    protein: float = 0,
+    fat: float = 0,
+    carbs: float = 0,
+) -> Row:
+    """
+    Атомарно прибавляет значения к дневной статистике.
+
+    Если строки за этот день ещё нет, она создаётся с целями из профиля
+    пользователя. Возвращает итоговые значения через RETURNING.
+    """
+    params = {
+        'b_user_id': user_id,
+        'b_date': stat_date,
+        'd_water': water,
+        'd_water_goal': water_goal,
+        'd_calories': calories,
+        'd_burned': burned,
+        'd_protein': protein,
+        'd_fat': fat,
+        'd_carbs': carbs,
+    }
+    result = await session.execute(_update_stats, params)
+    row = result.first()
+    if row is None:
+        result = await session.execute(_insert_stats, params)
+        row = result.one()
+    return row
@@ -0,0 +1,89 @@
+import os
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+
+from sqlalchemy import Row
+
+from database.models import DailyStats
+
+
+@dataclass(frozen=True)
+class CachedStats:
+    """Неизменяемая копия строки DailyStats за сегодня (ORM-объекта или строки Core)"""
+    user_id: int
+    stat_date: date
+    total_water: int
+    water_goal: int
+    total_calories: float
+    burned_calories: float
+    calorie_goal: int
+    total_protein: float
+    total_fat: float
+    total_carbs: float
+
+    @classmethod
+    def from_row(cls, stats: DailyStats | Row) -> 'CachedStats':
+        return cls(
+            user_id=stats.user_id,
+            stat_date=stats.stat_date,
+            total_water=stats.total_water or 0,
+            water_goal=stats.water_goal or 0,
+            total_calories=stats.total_calories or 0,
+            burned_calories=stats.burned_calories or 0,
+            calorie_goal=stats.calorie_goal or 0,
+            total_protein=stats.total_protein or 0,
+            total_fat=stats.total_fat or 0,
+            total_carbs=stats.total_carbs or 0,
+        )
+
+
+class DailyStatsCache:
+    """
+    LRU-кэш сегодняшней статистики по telegram_id.
+
+    Заполняется в тех же хэндлерах, что пишут DailyStats в БД, значением из
+    RETURNING — до коммита транзакции обновления. Если транзакция
+    откатывается, middleware DataBaseSession сбрасывает запись пользователя.
+    При смене дня кэш целиком сбрасывается.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._date = date.today()
+        self._items: OrderedDict[int, CachedStats] = OrderedDict()
+
+    def _rollover(self) -> date:
+        today = date.today()
+        if today != self._date:
+            self._items.clear()
+            self._date = today
+        return today
+
+    def get(self, telegram_id: int) -> CachedStats | None:
+        self._rollover()
+        stats = self._items.get(telegram_id)
+        if stats is not None:
+            self._items.move_to_end(telegram_id)
+        return stats
+
+    def put(self, telegram_id: int, stats: DailyStats | Row) -> CachedStats:
+        cached = CachedStats.from_row(stats)
+        if cached.stat_date != self._rollover():
+            return cached
+
+        self._items[telegram_id] = cached
+        self._items.move_to_end(telegram_id)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+        return cached
+
+    def invalidate(self, telegram_id: int) -> None:
+        self._items.pop(telegram_id, None)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+stats_cache = DailyStatsCache(int(os.getenv('STATS_CACHE_SIZE', 10000)))
@@ -1,15 +1,17 @@
 import os
+import time
 import aiohttp
 
+from collections import OrderedDict
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from database.models import User, DailyStats
 
 from datetime import date
 
-from dotenv import load_dotenv
-
-load_dotenv()
+from services.http import get_session
+from services.resilience import Upstream, CircuitOpenError
 
 async def create_or_update_user(
     session: AsyncSession,
@@ -52,7 +54,7 @@ async def create_or_update_user(
         )
         session.add(user)
     
-    await session.commit()
+    await session.flush()
     return user
 
 
@@ -80,12 +82,35 @@ async def get_or_create_daily_stats(session: AsyncSession, user_id: int, stat_da
             calorie_goal=user.calorie_goal or 0
         )
         session.add(stats)
-        await session.commit()
-        await session.refresh(stats)
+        await session.flush()
     
     return stats
 
 
+OPENWEATHER_URL = os.getenv('OPENWEATHER_URL', 'https://api.openweathermap.org/data/2.5/weather')
+OPENFOODFACTS_URL = os.getenv('OPENFOODFACTS_URL', 'https://world.openfoodfacts.org')
+
+DEFAULT_TEMPERATURE = 20.0
+TEMPERATURE_TTL = 3600
+FOOD_CACHE_SIZE = 1024
+
+weather_upstream = Upstream('openweathermap', timeout=3.0)
+food_upstream = Upstream('openfoodfacts', timeout=5.0, hedge=True)
+
+# Последние удачные ответы: используются, пока предохранитель разомкнут
+_temperature_cache: dict[str, tuple[float, float]] = {}
+_food_cache: OrderedDict[str, dict | None] = OrderedDict()
+
+
+async def _fetch_json(url: str, params: dict) -> dict:
+    async with get_session().get(url, params=params) as response:
+        if response.status != 200:
+            raise aiohttp.ClientResponseError(
+                response.request_info, response.history, status=response.status
+            )
+        return await response.json(content_type=None)
+
+
 async def get_temperature(city: str) -> float:
     """
     Получает текущую температуру в городе через OpenWeatherMap API.
@@ -94,31 +119,112 @@ async def get_temperature(city: str) -> float:
         city: Название города
         
     Returns:
-        Температура в градусах Цельсия или 20.0 по умолчанию при ошибке
+        Температура в градусах Цельсия; при ошибке или разомкнутом
+        предохранителе — последнее известное значение или 20.0
     """
     api_key = os.getenv('OPENWEATHER_API_KEY')
     
     if not api_key:
-        return 20.0
+        return DEFAULT_TEMPERATURE
     
+    key = city.strip().lower()
+    cached = _temperature_cache.get(key)
+    if cached and time.monotonic() - cached[1] < TEMPERATURE_TTL:
+        return cached[0]
+
+    params = {
+        'q': city,
+        'units': 'metric',
+        'lang': 'ru',
+        'appid': api_key
+    }
+
     try:
-        url = f'https://api.openweathermap.org/data/2.5/weather'
-        params = {
-            'q': city,
-            'units': 'metric',
-            'lang': 'ru',
-            'appid': api_key
-        }
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return round(data['main']['temp'], 1)
-                else:
-                    return 20.0
+        data = await weather_upstream.call(lambda: _fetch_json(OPENWEATHER_URL, params))
+        temperature = round(data['main']['temp'], 1)
     except Exception:
-        return 20.0
+        return cached[0] if cached else DEFAULT_TEMPERATURE
+
+    _temperature_cache[key] = (temperature, time.monotonic())
+    return temperature
+
+
+async def search_product(food_name: str) -> dict | None:
+    """
+    Ищет продукт в OpenFoodFacts.
+
+    Returns:
+        Первый найденный продукт (product_name, nutriments) или None
+
+    Raises:
+        CircuitOpenError: сервис недоступен и в кэше нет ответа
+    """
+    key = food_name.strip().lower()
+    params = {
+        'search_terms': food_name,
+        'search_simple': 1,
+        'action': 'process',
+        'json': 1,
+        'page_size': 1,
+        'fields': 'product_name,nutriments'
+    }
+
+    try:
+        data = await food_upstream.call(
+            lambda: _fetch_json(f'{OPENFOODFACTS_URL}/cgi/search.pl', params)
+        )
+    except CircuitOpenError:
+        if key in _food_cache:
+            return _food_cache[key]
+        raise
+
+    products = data.get('products')
+    product = products[0] if products else None
+
+    _food_cache[key] = product
+    _food_cache.move_to_end(key)
+    if len(_food_cache) > FOOD_CACHE_SIZE:
+        _food_cache.popitem(last=False)
+
+    return product
+
+async def get_product_by_barcode(barcode: str) -> dict | None:
+    """
+    Получает продукт из OpenFoodFacts по штрихкоду.
+
+    Returns:
+        Продукт (product_name, nutriments) или None, если код неизвестен
+    """
+    try:
+        data = await food_upstream.call(
+            lambda: _fetch_json(
+                f'{OPENFOODFACTS_URL}/api/v2/product/{barcode}.json',
+                {'fields': 'product_name,nutriments'}
+            )
+        )
+    except aiohttp.ClientResponseError as e:
+        # На неизвестный код OpenFoodFacts отвечает 404 — это промах, а не ошибка
+        if e.status == 404:
+            return None
+        raise
+    if data.get('status') != 1:
+        return None
+    return data.get('product')
+
+
+def parse_nutrition(product: dict, fallback_name: str) -> dict:
+    """Извлекает название и пищевую ценность на 100 г из ответа OpenFoodFacts"""
+    nutriments = product.get('nutriments', {})
+    
+    # Безопасное преобразование в float
+    return {
+        'food_name': product.get('product_name') or fallback_name,
+        'calories_per_100g': float(nutriments.get('energy-kcal_100g') or nutriments.get('energy_100g') or 0),
+        'protein': float(nutriments.get('proteins_100g') or 0),
+        'fat': float(nutriments.get('fat_100g') or 0),
+        'carbs': float(nutriments.get('carbohydrates_100g') or 0),
+    }
+
 
 async def calculate_norms(weight: float, height: float, age: int, 
                          active_minutes: int, city: str) -> dict:
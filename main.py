@@ -1,6 +1,15 @@
+import time
+
+STARTED_AT = time.perf_counter()
+
 import asyncio
 import logging
-import os 
+import os
+
+from dotenv import load_dotenv
+
+# Загружаем .env до импорта модулей бота: они читают настройки при импорте
+load_dotenv()
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
@@ -10,34 +19,93 @@ from aiogram.types import Message
 
 from routers.profile import profile_router
 from routers.progress import progress_router
+from routers.admin import admin_router
+from routers.challenge import challenge_router
 
-from database.engine import init_db, session_maker
-from middlewares.db import DataBaseSession
+from analytics.snapshot import snapshot_loop
 
-from dotenv import load_dotenv
+from database.engine import engine, init_db, session_maker
+from middlewares.db import DataBaseSession
+from services.http import close_session
+from services.barcode import shutdown_pool
+from services.backup import backup_loop
+from database.product_index import product_index
+from services.catchup import catch_up, track_update, offset_flush_loop
+from services.challenges import registry as challenge_registry
+from services import metrics
 
-load_dotenv()
+IMPORTED_AT = time.perf_counter()
 
 TOKEN = os.getenv('TOKEN')
+CATCHUP_ON_START = os.getenv('CATCHUP_ON_START', '1') == '1'
 
-bot = Bot(token=TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
 dp = Dispatcher()
 
 
+_first_update_seen = False
+
+
+async def first_update_timer(handler, event, data):
+    """Outer-middleware: время от запуска процесса до первого обновления"""
+    global _first_update_seen
+
+    if not _first_update_seen:
+        _first_update_seen = True
+        elapsed = time.perf_counter() - STARTED_AT
+        metrics.set_gauge('startup_time_to_first_update_seconds', elapsed)
+        logging.info('Time to first update: %.2fs', elapsed)
+    return await handler(event, data)
+
+
 @dp.message(CommandStart())
 async def command_start_handler(message: Message):
     await message.answer(f"Привет, {message.from_user.full_name}!")
 
 
-async def main():
-    await init_db()
-    
+def setup_dispatcher():
+    """Подключает роутеры и middlewares к диспетчеру"""
     dp.include_router(profile_router)
     dp.include_router(progress_router)
+    dp.include_router(admin_router)
+    dp.include_router(challenge_router)
     
+    dp.update.outer_middleware(first_update_timer)
+    dp.update.outer_middleware(track_update)
     dp.update.middleware(DataBaseSession(session_pool=session_maker))
+    dp.shutdown.register(close_session)
+    dp.shutdown.register(shutdown_pool)
+    # Поток aiosqlite не демон: без dispose процесс не завершится
+    dp.shutdown.register(engine.dispose)
+
+
+async def main():
+    bot = Bot(token=TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+
+    await init_db()
+    await challenge_registry.load(session_maker)
+    await product_index.load(session_maker)
+    
+    setup_dispatcher()
+
+    ready_at = time.perf_counter()
+    metrics.set_gauge('startup_imports_seconds', IMPORTED_AT - STARTED_AT)
+    metrics.set_gauge('startup_ready_seconds', ready_at - STARTED_AT)
+    logging.info(
+        'Startup: imports %.2fs, init %.2fs, ready in %.2fs',
+        IMPORTED_AT - STARTED_AT, ready_at - IMPORTED_AT, ready_at - STARTED_AT,
+    )
     
-    await bot.delete_webhook(drop_pending_updates=True)
+    snapshot_task = asyncio.create_task(snapshot_loop())
+    backup_task = asyncio.create_task(backup_loop(engine.url.database))
+
+    if CATCHUP_ON_START:
+        await bot.delete_webhook(drop_pending_updates=False)
+        await catch_up(bot, dp, session_maker)
+    else:
+        await bot.delete_webhook(drop_pending_updates=True)
+
+    offset_task = asyncio.create_task(offset_flush_loop(session_maker))
+
     await dp.start_polling(bot)
 
 
@@ -1,11 +1,81 @@
 from typing import Any, Awaitable, Callable, Dict
 
 from aiogram import BaseMiddleware
-from aiogram.types import TelegramObject, Message
+from aiogram.types import TelegramObject
 
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
-from database.models import User
+
+from database.stats_cache import stats_cache
+from services import metrics
+
+
+class LazySession:
+    """
+    Прокси к AsyncSession, который создаёт сессию только при первом обращении.
+
+    Хэндлеры, которые не работают с БД (/start, шаги анкеты профиля),
+    не создают сессию и не берут соединение из пула.
+    """
+
+    def __init__(self, session_pool: async_sessionmaker[AsyncSession]) -> None:
+        self._session_pool = session_pool
+        self._session: AsyncSession | None = None
+        self._after_commit: list[Callable[[], Any]] = []
+        # Была ли запись обновления зафиксирована: такое обновление нельзя повторять
+        self.committed = False
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None
+
+    def _get(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._session_pool()
+            metrics.inc('db_sessions_total')
+        return self._session
+
+    def after_commit(self, callback: Callable[[], Any]) -> None:
+        """Выполнить callback после успешного коммита транзакции обновления"""
+        self._after_commit.append(callback)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get(), name)
+
+    async def commit(self) -> None:
+        """
+        Фиксирует транзакцию обновления.
+
+        Хэндлеры вызывают его после записи и до ответа в Telegram: блокировка
+        SQLite на запись не держится на время запроса к Bot API, а ошибка
+        отправки не откатывает уже выполненную запись.
+        """
+        session = self._session
+        if session is None or not session.in_transaction():
+            return
+
+        await session.commit()
+        self.committed = True
+        metrics.inc('db_commits_total')
+
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    async def finish(self, commit: bool) -> None:
+        """Завершает обновление: коммит незафиксированных изменений или откат"""
+        session = self._session
+        if session is None:
+            return
+
+        try:
+            if commit:
+                await self.commit()
+            elif session.in_transaction():
+                await session.rollback()
+                metrics.inc('db_rollbacks_total')
+        finally:
+            await session.close()
+            self._after_commit.clear()
 
 
 class DataBaseSession(BaseMiddleware):
@@ -18,7 +88,22 @@ class DataBaseSession(BaseMiddleware):
         event: TelegramObject,
         data: Dict[str, Any],
     ) -> Any:
+        session = LazySession(self.session_pool)
+        data['session'] = session
+        # Вызывающий feed_update(..., db_sessions=[]) узнаёт, что обновление закоммитило
+        if 'db_sessions' in data:
+            data['db_sessions'].append(session)
+        metrics.inc('db_updates_total')
 
-        async with self.session_pool() as session:
-            data['session'] = session
-            return await handler(event, data)
\ No newline at end of file
+        try:
+            result = await handler(event, data)
+            await session.finish(commit=True)
+            return result
+        except Exception:
+            if session.started:
+                await session.finish(commit=False)
+                # Кэш мог быть обновлён до отката транзакции
+                user = data.get('event_from_user')
+                if user is not None:
+                    stats_cache.invalidate(user.id)
+            raise
@@ -0,0 +1,153 @@
+import asyncio
+import os
+import time
+
+from html import escape
+
+from aiogram import Router, F
+from aiogram.filters import Command
+from aiogram.types import Message, FSInputFile
+
+from database.engine import engine
+from services import metrics
+
+# Отчёты, профайлер и бэкапы нужны редко, поэтому импортируются в хэндлерах
+
+ADMIN_IDS = {int(x) for x in os.getenv('ADMIN_IDS', '').split(',') if x.strip()}
+
+admin_router = Router()
+admin_router.message.filter(F.from_user.id.in_(ADMIN_IDS))
+
+
+@admin_router.message(Command('admin_stats'))
+async def admin_stats(message: Message):
+    """Агрегированная статистика по всем пользователям из последнего снимка"""
+    from analytics.reports import load_latest, build_report
+
+    args = message.text.split(maxsplit=1)
+    try:
+        days = int(args[1]) if len(args) > 1 else 30
+    except ValueError:
+        await message.answer('❌ Используйте: /admin_stats [дней]\nПример: /admin_stats 7')
+        return
+
+    snapshot = load_latest()
+    if snapshot is None:
+        await message.answer('❌ Снимок ещё не готов. Создайте его командой /admin_snapshot')
+        return
+
+    started = time.perf_counter()
+    report = await asyncio.to_thread(build_report, snapshot, days)
+    elapsed = time.perf_counter() - started
+
+    attainment = report['attainment']
+    age_minutes = (time.time() - snapshot.created_at) / 60
+
+    response = (
+        f"📈 <b>Статистика за {days} дн.</b>\n"
+        f"<i>Снимок {snapshot.name} ({age_minutes:.0f} мин назад), расчёт {elapsed * 1000:.0f} мс</i>\n\n"
+        f"🎯 <b>Достижение целей</b> ({attainment['days']} дней):\n"
+        f"• Норма воды: {attainment['water_rate'] * 100:.1f}%\n"
+        f"• Калории в пределах нормы: {attainment['calorie_rate'] * 100:.1f}%\n\n"
+        f"🏙 <b>Потребление / цель по городам:</b>\n"
+    )
+    for row in report['cities']:
+        response += (
+            f"• {escape(row['city'])} ({row['days']}): "
+            f"💧 {row['total_water']:.0f}/{row['water_goal']:.0f} мл, "
+            f"🔥 {row['total_calories']:.0f}/{row['calorie_goal']:.0f} ккал\n"
+        )
+
+    response += "\n🍽 <b>Популярные продукты:</b>\n"
+    for row in report['foods']:
+        response += f"• {escape(row['name'])}: {row['count']} раз, {row['calories']:.0f} ккал\n"
+
+    response += "\n🏋️ <b>Популярные тренировки:</b>\n"
+    for row in report['workouts']:
+        response += (
+            f"• {escape(row['name'])}: {row['count']} раз, "
+            f"{row['duration']:.0f} мин, {row['calories_burned']:.0f} ккал\n"
+        )
+
+    await message.answer(response, parse_mode='HTML')
+
+
+@admin_router.message(Command('admin_snapshot'))
+async def admin_snapshot(message: Message):
+    """Внеочередное обновление снимка для аналитики"""
+    from analytics import snapshot
+
+    if snapshot.is_running():
+        await message.answer('⏳ Снимок уже создаётся, дождитесь результата')
+        return
+
+    started = time.perf_counter()
+    try:
+        path = await snapshot.run_export()
+    except Exception as e:
+        await message.answer(f'❌ Ошибка снимка: {escape(str(e))}')
+        return
+
+    await message.answer(
+        f'✅ Снимок {os.path.basename(path)} создан за {time.perf_counter() - started:.1f} с'
+    )
+
+
+@admin_router.message(Command('admin_metrics'))
+async def admin_metrics(message: Message):
+    """Текущие метрики процесса в формате Prometheus"""
+    await message.answer(f'<pre>{escape(metrics.render())}</pre>', parse_mode='HTML')
+
+
+@admin_router.message(Command('admin_profile'))
+async def admin_profile(message: Message):
+    """Сэмплирующий профайлер на N секунд: сводка и файл для flamegraph"""
+    from services import profiler
+
+    args = message.text.split(maxsplit=1)
+    try:
+        seconds = int(args[1]) if len(args) > 1 else 30
+        if seconds <= 0 or seconds > 300:
+            raise ValueError
+    except ValueError:
+        await message.answer('❌ Используйте: /admin_profile [секунд, 1-300]\nПример: /admin_profile 30')
+        return
+
+    if profiler.is_running():
+        await message.answer('⏳ Профилирование уже идёт, дождитесь результата')
+        return
+
+    await message.answer(f'🔬 Профилирую {seconds} с...')
+    # Хэндлеры всех роутеров диспетчера, в который включён admin_router
+    root = admin_router
+    while root.parent_router is not None:
+        root = root.parent_router
+    result = await profiler.profile(seconds, profiler.handler_codes(root))
+
+    await message.answer(f'<pre>{escape(result.summary())}</pre>', parse_mode='HTML')
+    if result.stacks:
+        await message.answer_document(FSInputFile(result.path), caption='collapsed stacks (flamegraph.pl / speedscope)')
+
+
+@admin_router.message(Command('admin_backup'))
+async def admin_backup(message: Message):
+    """Внеочередной онлайн-бэкап БД"""
+    from services import backup
+
+    if backup.is_running():
+        await message.answer('⏳ Бэкап уже выполняется, дождитесь результата')
+        return
+
+    await message.answer('💾 Снимаю бэкап...')
+    try:
+        result = await backup.run_backup(engine.url.database)
+    except Exception as e:
+        await message.answer(f'❌ Ошибка бэкапа: {escape(str(e))}')
+        return
+
+    await message.answer(
+        f'✅ Бэкап {escape(os.path.basename(result.path))}\n'
+        f'• Размер: {result.size / 2**20:.1f} МБ\n'
+        f'• Время: {result.duration:.1f} с\n'
+        f'• Лаг event loop: p99 {result.lag_p99 * 1000:.1f} мс, max {result.lag_max * 1000:.1f} мс'
+    )
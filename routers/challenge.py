@@ -0,0 +1,112 @@
+from html import escape
+
+from aiogram import Router, F
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.queries import get_user_brief
+from services.challenges import registry, METRICS, WATER, BURNED
+
+challenge_router = Router()
+challenge_router.message.filter(F.chat.type.in_({'group', 'supergroup'}))
+
+
+def _format_score(metric: str, score: float) -> str:
+    if metric == WATER:
+        return f'{score:.0f} дн.'
+    return f'{score:.0f} ккал'
+
+
+@challenge_router.message(Command('challenge_start'))
+async def challenge_start(message: Message, session: AsyncSession):
+    """Запуск недельного челленджа в группе"""
+    args = message.text.split(maxsplit=1)
+    metric = args[1].strip().lower() if len(args) > 1 else WATER
+
+    if metric not in METRICS:
+        await message.answer(
+            f'❌ Используйте: /challenge_start [{WATER}|{BURNED}]\n'
+            f'• {WATER} — {METRICS[WATER]}\n'
+            f'• {BURNED} — {METRICS[BURNED]}'
+        )
+        return
+
+    current = registry.current(message.chat.id)
+    if current is not None:
+        await message.answer(
+            f'ℹ️ На этой неделе уже идёт челлендж: {METRICS[current.metric]}.\n'
+            f'Присоединяйтесь командой /challenge_join'
+        )
+        return
+
+    challenge_id = await registry.create(session, message.chat.id, metric)
+    await session.commit()
+    if challenge_id is None:
+        await message.answer('ℹ️ На этой неделе челлендж уже запущен. Присоединяйтесь командой /challenge_join')
+        return
+
+    await message.answer(
+        f'🏁 <b>Челлендж недели запущен!</b>\n'
+        f'Соревнуемся: {METRICS[metric]}.\n\n'
+        f'Присоединяйтесь командой /challenge_join, рейтинг — /leaderboard',
+        parse_mode='HTML'
+    )
+
+
+@challenge_router.message(Command('challenge_join'))
+async def challenge_join(message: Message, session: AsyncSession):
+    """Вступление в челлендж группы"""
+    challenge = registry.current(message.chat.id)
+    if challenge is None:
+        await message.answer('❌ В этом чате нет челленджа. Запустите его командой /challenge_start')
+        return
+
+    user = await get_user_brief(session, message.from_user.id)
+    if not user:
+        await message.answer('❌ Сначала настройте профиль командой /set_profile в личных сообщениях с ботом')
+        return
+
+    if user.id in challenge.board:
+        await message.answer(f'ℹ️ Вы уже участвуете, ваше место: {challenge.board.rank(user.id)}')
+        return
+
+    score = await registry.join(
+        session, challenge, user.id, message.from_user.id, message.from_user.full_name
+    )
+    await session.commit()
+    if score is None:
+        await message.answer('ℹ️ Вы уже участвуете в челлендже')
+        return
+
+    await message.answer(
+        f'✅ {escape(message.from_user.full_name)} в игре! '
+        f'Стартовый результат: {_format_score(challenge.metric, score)}',
+        parse_mode='HTML'
+    )
+
+
+@challenge_router.message(Command('leaderboard'))
+async def leaderboard(message: Message):
+    """Рейтинг участников челленджа"""
+    challenge = registry.current(message.chat.id)
+    if challenge is None:
+        await message.answer('❌ В этом чате нет челленджа. Запустите его командой /challenge_start')
+        return
+
+    medals = {1: '🥇', 2: '🥈', 3: '🥉'}
+    response = (
+        f'🏆 <b>Рейтинг недели</b>: {METRICS[challenge.metric]}\n'
+        f'Участников: {len(challenge.board)}\n\n'
+    )
+    for place, (user_id, score) in enumerate(challenge.board.top(10), start=1):
+        name = escape(challenge.names.get(user_id) or 'Участник')
+        response += f"{medals.get(place, f'{place}.')} {name} — {_format_score(challenge.metric, score)}\n"
+
+    user_id = registry.user_ids.get(message.from_user.id)
+    rank = challenge.board.rank(user_id) if user_id is not None else None
+    if rank is not None:
+        response += f'\nВаше место: {rank} ({_format_score(challenge.metric, challenge.board.score(user_id))})'
+
+    await message.answer(response, parse_mode='HTML')
@@ -124,6 +124,7 @@ async def set_city(message: Message, state: FSMContext, session: AsyncSession):
         water_goal=int(norms['total_water'] * 1000),
         calorie_goal=norms['total_calories']
     )
+    await session.commit()
     
     # Формируем сообщение о норме воды с учетом погоды
     water_breakdown = (
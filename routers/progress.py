@@ -1,23 +1,31 @@
-import aiohttp
+import logging
 import os
 
-from dotenv import load_dotenv
-
-from aiogram import Router
+from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
 
 from datetime import date
 
-from database.models import User, WaterLog, FoodLog, WorkoutLog, DailyStats
-from database.utils import get_or_create_daily_stats
-
-load_dotenv()
+from database.queries import (
+    get_user_brief,
+    get_daily_stats,
+    add_to_daily_stats,
+    add_water_log,
+    add_food_log,
+    add_workout_log,
+)
+from database.product_index import product_index
+from database.utils import search_product, get_product_by_barcode, parse_nutrition
+from database.stats_cache import stats_cache
+from services import metrics
+from services.challenges import registry, water_attainment_delta, WATER, BURNED
+from services.barcode import decode as decode_barcode, BarcodeDecodeError
+from services.resilience import CircuitOpenError
 
 progress_router = Router()
 
@@ -78,27 +86,21 @@ async def log_water(message: Message, session: AsyncSession):
         await message.answer('❌ Пожалуйста, введите число')
         return
     
-    result = await session.execute(
-        select(User).where(User.telegram_id == message.from_user.id)
-    )
-    user = result.scalar_one_or_none()
+    user = await get_user_brief(session, message.from_user.id)
     
     if not user:
         await message.answer('❌ Сначала настройте профиль командой /set_profile')
         return
     
     # Создаем запись
-    water_log = WaterLog(
-        user_id=user.id,
-        amount=amount,
-        log_date=date.today()
-    )
-    session.add(water_log)
+    today = date.today()
+    await add_water_log(session, user.id, amount, today)
     
     # Обновляем дневную статистику
-    stats = await get_or_create_daily_stats(session, user.id, date.today())
-    stats.total_water += amount # pyright: ignore[reportAttributeAccessIssue]
+    stats = await add_to_daily_stats(session, user.id, today, water=amount)
+    await registry.record(session, user.id, WATER, water_attainment_delta(stats, water=amount))
     
+    stats = stats_cache.put(message.from_user.id, stats)
     await session.commit()
     
     # Рассчитываем прогресс
@@ -131,10 +133,7 @@ async def log_food(message: Message, state: FSMContext, session: AsyncSession):
     
     food_name = args[1].strip()
     
-    result = await session.execute(
-        select(User).where(User.telegram_id == message.from_user.id)
-    )
-    user = result.scalar_one_or_none()
+    user = await get_user_brief(session, message.from_user.id)
     
     if not user:
         await message.answer('❌ Сначала настройте профиль командой /set_profile')
@@ -144,67 +143,94 @@ async def log_food(message: Message, state: FSMContext, session: AsyncSession):
     
     # Поиск продукта через OpenFoodFacts API
     try:
-        async with aiohttp.ClientSession() as http_session:
-            url = f"https://world.openfoodfacts.org/cgi/search.pl"
-            params = {
-                'search_terms': food_name,
-                'search_simple': 1,
-                'action': 'process',
-                'json': 1,
-                'page_size': 1,
-                'fields': 'product_name,nutriments'
-            }
-            
-            async with http_session.get(url, params=params) as response:
-                data = await response.json()
-                
-                if not data.get('products'):
-                    await message.answer(f'❌ Продукт "{food_name}" не найден. Попробуйте другое название.')
-                    return
-                
-                product = data['products'][0]
-                product_name = product.get('product_name', food_name)
-                nutriments = product.get('nutriments', {})
-                
-                # Безопасное преобразование в float
-                calories_per_100g = float(nutriments.get('energy-kcal_100g') or nutriments.get('energy_100g') or 0)
-                protein = float(nutriments.get('proteins_100g') or 0)
-                fat = float(nutriments.get('fat_100g') or 0)
-                carbs = float(nutriments.get('carbohydrates_100g') or 0)
-                
-                if calories_per_100g == 0:
-                    await message.answer(f'❌ Не удалось получить данные о калорийности для "{product_name}"')
-                    return
-                
-                # Сохраняем данные в FSM для следующего шага
-                await state.update_data(
-                    food_name=product_name,
-                    calories_per_100g=calories_per_100g,
-                    protein=protein,
-                    fat=fat,
-                    carbs=carbs,
-                    user_id=user.id
-                )
-                await state.set_state(FoodState.waiting_for_amount)
-
-                waiting_message.delete()
-                
-                emoji = '🍌' if 'банан' in product_name.lower() else '🍽'
-                await message.answer(
-                    f"{emoji} <b>{product_name}</b>\n\n"
-                    f"📊 На 100 г:\n"
-                    f"• Калории: {calories_per_100g:.1f} ккал\n"
-                    f"• Белки: {protein:.1f} г\n"
-                    f"• Жиры: {fat:.1f} г\n"
-                    f"• Углеводы: {carbs:.1f} г\n\n"
-                    f"❓ Сколько грамм вы съели?",
-                    parse_mode='HTML'
-                )
-                
+        product = await search_product(food_name)
+    except CircuitOpenError:
+        await message.answer('⚠️ Сервис поиска продуктов временно недоступен. Попробуйте позже.')
+        return
     except Exception as e:
-        print(e)
-        await message.answer(f'❌ Ошибка при поиске продукта: {str(e)}')
+        logging.warning('OpenFoodFacts search failed: %r', e)
+        await message.answer(f'❌ Ошибка при поиске продукта: {str(e) or type(e).__name__}')
+        return
+    finally:
+        await waiting_message.delete()
 
+    if not product:
+        await message.answer(f'❌ Продукт "{food_name}" не найден. Попробуйте другое название.')
+        return
+    
+    await ask_food_amount(message, state, user.id, parse_nutrition(product, food_name))
+
+
+@progress_router.message(F.photo, F.chat.type == 'private')
+async def log_food_barcode(message: Message, state: FSMContext, session: AsyncSession):
+    """Логирование еды по фото штрихкода"""
+    user = await get_user_brief(session, message.from_user.id)
+    
+    if not user:
+        await message.answer('❌ Сначала настройте профиль командой /set_profile')
+        return
+    
+    image = await message.bot.download(message.photo[-1])
+    try:
+        barcode = await decode_barcode(image.getvalue())
+    except BarcodeDecodeError as e:
+        logging.warning('Barcode decode failed: %s', e)
+        await message.answer('❌ Не удалось обработать изображение. Отправьте фото штрихкода ещё раз.')
+        return
+    
+    if not barcode:
+        await message.answer('❌ Не удалось распознать штрихкод. Сфотографируйте его крупнее и при хорошем освещении.')
+        return
+    
+    food = product_index.get(barcode)
+    metrics.inc('product_index_total', outcome='hit' if food else 'miss')
+    
+    if food is None:
+        try:
+            product = await get_product_by_barcode(barcode)
+        except CircuitOpenError:
+            await message.answer('⚠️ Сервис поиска продуктов временно недоступен. Попробуйте позже.')
+            return
+        except Exception as e:
+            logging.warning('OpenFoodFacts barcode lookup failed: %r', e)
+            await message.answer(f'❌ Ошибка при поиске продукта: {str(e) or type(e).__name__}')
+            return
+        
+        if not product:
+            await message.answer(f'❌ Продукт со штрихкодом {barcode} не найден. Попробуйте /log_food [название]')
+            return
+        
+        food = parse_nutrition(product, barcode)
+        if food['calories_per_100g'] > 0:
+            await product_index.add(session, barcode, food)
+            await session.commit()
+    
+    await ask_food_amount(message, state, user.id, food)
+
+
+async def ask_food_amount(message: Message, state: FSMContext, user_id: int, food: dict):
+    """Показывает пищевую ценность продукта и переходит к вводу количества"""
+    product_name = food['food_name']
+    
+    if food['calories_per_100g'] == 0:
+        await message.answer(f'❌ Не удалось получить данные о калорийности для "{product_name}"')
+        return
+    
+    # Сохраняем данные в FSM для следующего шага
+    await state.update_data(**food, user_id=user_id)
+    await state.set_state(FoodState.waiting_for_amount)
+    
+    emoji = '🍌' if 'банан' in product_name.lower() else '🍽'
+    await message.answer(
+        f"{emoji} <b>{product_name}</b>\n\n"
+        f"📊 На 100 г:\n"
+        f"• Калории: {food['calories_per_100g']:.1f} ккал\n"
+        f"• Белки: {food['protein']:.1f} г\n"
+        f"• Жиры: {food['fat']:.1f} г\n"
+        f"• Углеводы: {food['carbs']:.1f} г\n\n"
+        f"❓ Сколько грамм вы съели?",
+        parse_mode='HTML'
+    )
 
 
 @progress_router.message(FoodState.waiting_for_amount)
@@ -228,7 +254,9 @@ async def process_food_amount(message: Message, state: FSMContext, session: Asyn
     carbs = (data['carbs'] * amount) / 100
     
     # Создаем запись о еде
-    food_log = FoodLog(
+    today = date.today()
+    await add_food_log(
+        session,
         user_id=data['user_id'],
         food_name=data['food_name'],
         calories=calories,
@@ -236,17 +264,16 @@ async def process_food_amount(message: Message, state: FSMContext, session: Asyn
         protein=protein,
         fat=fat,
         carbs=carbs,
-        log_date=date.today()
+        log_date=today
     )
-    session.add(food_log)
     
     # Обновляем дневную статистику
-    stats = await get_or_create_daily_stats(session, data['user_id'], date.today())
-    stats.total_calories += calories
-    stats.total_protein += protein
-    stats.total_fat += fat
-    stats.total_carbs += carbs
+    stats = await add_to_daily_stats(
+        session, data['user_id'], today,
+        calories=calories, protein=protein, fat=fat, carbs=carbs
+    )
     
+    stats = stats_cache.put(message.from_user.id, stats)
     await session.commit()
     await state.clear()
     
@@ -299,10 +326,7 @@ async def log_workout(message: Message, session: AsyncSession):
         await message.answer('❌ Пожалуйста, введите корректное количество минут')
         return
     
-    result = await session.execute(
-        select(User).where(User.telegram_id == message.from_user.id)
-    )
-    user = result.scalar_one_or_none()
+    user = await get_user_brief(session, message.from_user.id)
     
     if not user:
         await message.answer('❌ Сначала настройте профиль командой /set_profile')
@@ -320,21 +344,25 @@ async def log_workout(message: Message, session: AsyncSession):
     water_needed = int((duration / 30) * 200)
     
     # Создаем запись о тренировке
-    workout_log = WorkoutLog(
+    today = date.today()
+    await add_workout_log(
+        session,
         user_id=user.id,
         workout_type=workout_type,
         duration=duration,
         calories_burned=calories_burned,
         water_needed=water_needed,
-        log_date=date.today()
+        log_date=today
     )
-    session.add(workout_log)
     
     # Обновляем дневную статистику
-    stats = await get_or_create_daily_stats(session, user.id, date.today())
-    stats.burned_calories += calories_burned
-    stats.water_goal += water_needed
+    stats = await add_to_daily_stats(
+        session, user.id, today, burned=calories_burned, water_goal=water_needed
+    )
+    await registry.record(session, user.id, BURNED, calories_burned)
+    await registry.record(session, user.id, WATER, water_attainment_delta(stats, water_goal=water_needed))
     
+    stats_cache.put(message.from_user.id, stats)
     await session.commit()
 
     emoji = EMOJIS.get(workout_type, '💪')
@@ -356,16 +384,24 @@ async def log_workout(message: Message, session: AsyncSession):
 @progress_router.message(Command('check_progress'))
 async def check_progress(message: Message, session: AsyncSession):
     """Показать прогресс за сегодня"""
-    result = await session.execute(
-        select(User).where(User.telegram_id == message.from_user.id)
-    )
-    user = result.scalar_one_or_none()
-    
-    if not user:
-        await message.answer('❌ Сначала настройте профиль командой /set_profile')
-        return
-    
-    stats = await get_or_create_daily_stats(session, user.id, date.today())
+    stats = stats_cache.get(message.from_user.id)
+
+    if stats is None:
+        metrics.inc('stats_cache_total', outcome='miss')
+        user = await get_user_brief(session, message.from_user.id)
+        
+        if not user:
+            await message.answer('❌ Сначала настройте профиль командой /set_profile')
+            return
+        
+        today = date.today()
+        stats = await get_daily_stats(session, user.id, today)
+        if stats is None:
+            stats = await add_to_daily_stats(session, user.id, today)
+            await session.commit()
+        stats = stats_cache.put(message.from_user.id, stats)
+    else:
+        metrics.inc('stats_cache_total', outcome='hit')
 
     water_percent = min(100, int((stats.total_water / stats.water_goal) * 100)) if stats.water_goal > 0 else 0
     calorie_percent = min(100, int((stats.total_calories / stats.calorie_goal) * 100)) if stats.calorie_goal > 0 else 0
@@ -0,0 +1,271 @@
+"""
+Онлайн-бэкапы базы бота.
+
+Копия снимается через SQLite online backup API за один шаг в отдельном
+потоке, то есть внутри одной читающей транзакции. БД работает в режиме WAL
+(см. database/engine.py), поэтому читатель не блокирует писателей: хэндлеры
+продолжают коммитить, а копия соответствует моменту начала транзакции.
+Пошаговое копирование здесь не подходит — SQLite начинает его заново после
+каждого коммита в исходную БД, и при постоянной записи оно не завершается.
+Копия сжимается gzip, рядом пишется манифест с контрольными суммами
+и числом строк в таблицах.
+
+Задержку коммитов и лаг event loop во время бэкапа измеряет
+`python -m tools.backup_bench`.
+
+Проверка и восстановление:
+
+    python -m services.backup verify backups/backup-20260101-030000.db.gz
+    python -m services.backup restore backups/backup-20260101-030000.db.gz database.db
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from dataclasses import dataclass
+
+from services import metrics
+
+BACKUP_DIR = os.getenv('BACKUP_DIR', 'backups')
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', 7))
+BACKUP_INTERVAL = int(os.getenv('BACKUP_INTERVAL', 86400))
+
+CHUNK_SIZE = 1 << 20
+# Файлы рядом с БД, которые SQLite применит поверх восстановленной копии
+SIDECAR_SUFFIXES = ('-wal', '-shm', '-journal')
+
+_lock = asyncio.Lock()
+
+
+@dataclass
+class BackupResult:
+    path: str
+    size: int
+    duration: float
+    lag_p99: float
+    lag_max: float
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _table_counts(path: str) -> dict[str, int]:
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        )]
+        return {table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in tables}
+    finally:
+        conn.close()
+
+
+def create_backup(db_path: str, backup_dir: str = BACKUP_DIR, keep: int = BACKUP_KEEP) -> str:
+    """
+    Снимает сжатую копию БД и удаляет старые копии сверх keep.
+
+    Returns:
+        Путь к файлу .db.gz
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    name = f"backup-{time.strftime('%Y%m%d-%H%M%S')}.db.gz"
+    target = os.path.join(backup_dir, name)
+
+    with tempfile.TemporaryDirectory(dir=backup_dir) as tmp:
+        raw = os.path.join(tmp, 'copy.db')
+
+        src = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+        dst = sqlite3.connect(raw)
+        try:
+            # pages=-1: вся БД за один шаг, из одного снимка WAL
+            src.backup(dst)
+            # Копия — самостоятельный файл, без -wal/-shm рядом
+            dst.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            dst.close()
+            src.close()
+
+        manifest = {
+            'created_at': time.time(),
+            'source': os.path.abspath(db_path),
+            'raw_size': os.path.getsize(raw),
+            'raw_sha256': _sha256(raw),
+            'tables': _table_counts(raw),
+        }
+
+        tmp_target = os.path.join(tmp, name)
+        with open(raw, 'rb') as f_in, gzip.open(tmp_target, 'wb', compresslevel=6) as f_out:
+            shutil.copyfileobj(f_in, f_out, CHUNK_SIZE)
+
+        manifest['sha256'] = _sha256(tmp_target)
+        manifest['size'] = os.path.getsize(tmp_target)
+
+        with open(target + '.json', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_target, target)
+
+    backups = sorted(f for f in os.listdir(backup_dir) if f.startswith('backup-') and f.endswith('.db.gz'))
+    for old in backups[:-keep]:
+        for path in (old, old + '.json'):
+            try:
+                os.remove(os.path.join(backup_dir, path))
+            except FileNotFoundError:
+                pass
+
+    return target
+
+
+def verify_backup(path: str, restore_to: str | None = None) -> dict:
+    """
+    Проверяет копию: контрольные суммы, PRAGMA integrity_check и число строк.
+
+    Если указан restore_to, проверенная копия восстанавливается в этот файл:
+    его -wal/-shm/-journal удаляются, файл подменяется атомарно через
+    os.replace из временного файла в том же каталоге.
+
+    Raises:
+        ValueError: копия повреждена или не совпадает с манифестом
+    """
+    with open(path + '.json', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    if _sha256(path) != manifest['sha256']:
+        raise ValueError('checksum of compressed file does not match manifest')
+
+    # Для os.replace временный файл должен быть на той же файловой системе, что и цель
+    tmp_dir = os.path.dirname(os.path.abspath(restore_to)) if restore_to else None
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as tmp:
+        raw = os.path.join(tmp, 'restore.db')
+        with gzip.open(path, 'rb') as f_in, open(raw, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out, CHUNK_SIZE)
+
+        if _sha256(raw) != manifest['raw_sha256']:
+            raise ValueError('checksum of database does not match manifest')
+
+        conn = sqlite3.connect(raw)
+        try:
+            integrity = conn.execute('PRAGMA integrity_check').fetchone()[0]
+        finally:
+            conn.close()
+        if integrity != 'ok':
+            raise ValueError(f'integrity check failed: {integrity}')
+
+        counts = _table_counts(raw)
+        if counts != manifest['tables']:
+            raise ValueError(f'table row counts differ from manifest: {counts}')
+
+        if restore_to:
+            # Сначала журналы: оставшийся WAL откатил бы восстановление при следующем открытии
+            for suffix in SIDECAR_SUFFIXES:
+                try:
+                    os.remove(restore_to + suffix)
+                except FileNotFoundError:
+                    pass
+            os.replace(raw, restore_to)
+
+    return manifest
+
+
+async def _measure_lag(lags: list[float], done: asyncio.Event, tick: float = 0.05) -> None:
+    loop = asyncio.get_running_loop()
+    while not done.is_set():
+        expected = loop.time() + tick
+        await asyncio.sleep(tick)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+def is_running() -> bool:
+    return _lock.locked()
+
+
+async def run_backup(db_path: str) -> BackupResult:
+    """Снимает бэкап в отдельном потоке, измеряя лаг event loop во время копирования"""
+    async with _lock:
+        lags: list[float] = []
+        done = asyncio.Event()
+        lag_task = asyncio.create_task(_measure_lag(lags, done))
+        started = time.perf_counter()
+        try:
+            path = await asyncio.to_thread(create_backup, db_path)
+        except Exception:
+            metrics.inc('backups_total', outcome='error')
+            raise
+        finally:
+            done.set()
+            await lag_task
+
+        lags.sort()
+        result = BackupResult(
+            path=path,
+            size=os.path.getsize(path),
+            duration=time.perf_counter() - started,
+            lag_p99=lags[min(len(lags) - 1, int(len(lags) * 0.99))] if lags else 0.0,
+            lag_max=lags[-1] if lags else 0.0,
+        )
+        metrics.inc('backups_total', outcome='success')
+        metrics.set_gauge('backup_last_duration_seconds', result.duration)
+        metrics.set_gauge('backup_last_loop_lag_p99_seconds', result.lag_p99)
+        logging.info(
+            'Backup %s: %.1fMB in %.1fs, loop lag p99 %.1fms, max %.1fms',
+            path, result.size / 2**20, result.duration, result.lag_p99 * 1000, result.lag_max * 1000,
+        )
+        return result
+
+
+async def backup_loop(db_path: str, interval: int = BACKUP_INTERVAL):
+    """Бэкап по расписанию"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_backup(db_path)
+        except Exception:
+            logging.exception('Backup failed')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Verify or restore a bot database backup')
+    parser.add_argument('command', choices=['verify', 'restore'])
+    parser.add_argument('backup', help='путь к файлу .db.gz')
+    parser.add_argument('target', nargs='?', help='куда восстановить (для restore)')
+    parser.add_argument('--force', action='store_true', help='перезаписать существующий файл')
+    args = parser.parse_args()
+
+    if args.command == 'restore':
+        if not args.target:
+            parser.error('restore requires a target path')
+        existing = [path for path in (args.target, *(args.target + s for s in SIDECAR_SUFFIXES))
+                    if os.path.exists(path)]
+        if existing and not args.force:
+            parser.error(f"{', '.join(existing)} exists, stop the bot and use --force to overwrite")
+
+    try:
+        manifest = verify_backup(args.backup, restore_to=args.target if args.command == 'restore' else None)
+    except ValueError as e:
+        print(f'FAILED: {e}')
+        return 1
+
+    print(f"OK: {args.backup} ({manifest['raw_size'] / 2**20:.1f}MB, "
+          f"created {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(manifest['created_at']))})")
+    for table, count in sorted(manifest['tables'].items()):
+        print(f'  {table}: {count}')
+    if args.command == 'restore':
+        print(f'Restored to {args.target}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import asyncio
+import io
+import logging
+import os
+
+from typing import TYPE_CHECKING
+
+from services import metrics
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+BARCODE_WORKERS = int(os.getenv('BARCODE_WORKERS', 2))
+
+# Поддерживаемые форматы штрихкодов продуктов
+PRODUCT_SYMBOLS = ('EAN13', 'EAN8', 'UPCA', 'UPCE')
+
+_pool: 'ProcessPoolExecutor | None' = None
+
+
+class BarcodeDecodeError(Exception):
+    """Изображение не удалось обработать (битый файл или упавший воркер)"""
+
+
+def decode_barcode(image: bytes) -> str | None:
+    """
+    Распознаёт штрихкод продукта на изображении.
+
+    Выполняется в процессе-воркере, поэтому Pillow и pyzbar
+    импортируются здесь, а не в основном процессе бота.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(image)) as img:
+            gray = img.convert('L')
+    except (OSError, Image.DecompressionBombError) as e:
+        # Не изображение или обрезанный файл (OSError: image file is truncated).
+        # Исключения Pillow не передаём в основной процесс как есть
+        raise ValueError(f'unsupported image: {e}') from None
+
+    from pyzbar.pyzbar import decode, ZBarSymbol
+
+    symbols = [getattr(ZBarSymbol, name) for name in PRODUCT_SYMBOLS]
+    results = decode(gray, symbols=symbols)
+
+    for result in results:
+        code = result.data.decode('ascii', errors='ignore')
+        if code.isdigit():
+            return code
+    return None
+
+
+def get_pool() -> 'ProcessPoolExecutor':
+    global _pool
+
+    if _pool is None:
+        import multiprocessing
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        # fork из процесса с event loop и потоками aiosqlite небезопасен
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        _pool = ProcessPoolExecutor(max_workers=BARCODE_WORKERS, mp_context=multiprocessing.get_context(method))
+    return _pool
+
+
+async def shutdown_pool() -> None:
+    global _pool
+
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+async def decode(image: bytes) -> str | None:
+    """
+    Распознаёт штрихкод в пуле процессов, не блокируя event loop.
+
+    Raises:
+        BarcodeDecodeError: файл не является изображением, воркер упал
+            или декодер недоступен; сломанный пул пересоздаётся при следующем вызове
+    """
+    from concurrent.futures.process import BrokenProcessPool
+
+    loop = asyncio.get_running_loop()
+    try:
+        code = await loop.run_in_executor(get_pool(), decode_barcode, image)
+    except ValueError as e:
+        metrics.inc('barcode_decodes_total', outcome='invalid_image')
+        raise BarcodeDecodeError(str(e)) from e
+    except BrokenProcessPool as e:
+        metrics.inc('barcode_decodes_total', outcome='pool_broken')
+        await shutdown_pool()
+        raise BarcodeDecodeError('decoder worker died') from e
+    except Exception as e:
+        # Например, ImportError без libzbar: пользователь всё равно получает ответ
+        logging.exception('Barcode decoder failed')
+        metrics.inc('barcode_decodes_total', outcome='error')
+        raise BarcodeDecodeError(f'decoder failed: {e!r}') from e
+    metrics.inc('barcode_decodes_total', outcome='found' if code else 'not_found')
+    return code
@@ -0,0 +1,272 @@
+import asyncio
+import logging
+import time
+
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+from aiogram.methods import GetUpdates
+from aiogram.types import Update
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+
+from database.models import BotState
+from services import metrics
+
+OFFSET_KEY = 'last_update_id'
+
+# Пачка — одна страница getUpdates (Telegram отдаёт не больше 100 обновлений).
+# Следующий getUpdates с бо́льшим offset подтверждает предыдущую страницу,
+# и Telegram её больше не отдаст, поэтому пачка обрабатывается до следующего запроса.
+FETCH_LIMIT = 100
+CONCURRENCY = 64
+FLUSH_INTERVAL = 5
+
+# Telegram допускает около 30 сообщений в секунду на бота; при догоне
+# ответы отправляются с запасом ниже этого лимита
+SEND_RATE = 25
+RETRY_AFTER_ATTEMPTS = 5
+
+# Повторы обновления, которое упало, ничего не закоммитив (ошибка БД или хэндлера)
+UPDATE_RETRIES = 3
+RETRY_DELAY = 0.5
+
+_last_update_id: int | None = None
+
+# Обработанные при догоне обновления, которые Telegram отдаст повторно
+_skip_ids: set[int] = set()
+
+
+async def load_offset(session_pool: async_sessionmaker[AsyncSession]) -> int | None:
+    async with session_pool() as session:
+        result = await session.execute(
+            select(BotState.value).where(BotState.key == OFFSET_KEY)
+        )
+        return result.scalar_one_or_none()
+
+
+async def save_offset(session_pool: async_sessionmaker[AsyncSession], update_id: int) -> None:
+    async with session_pool() as session:
+        await session.merge(BotState(key=OFFSET_KEY, value=update_id))
+        await session.commit()
+
+
+async def track_update(
+    handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+    event: Update,
+    data: Dict[str, Any],
+) -> Any:
+    """Outer-middleware: запоминает последний полученный update_id"""
+    global _last_update_id
+
+    if _last_update_id is None or event.update_id > _last_update_id:
+        _last_update_id = event.update_id
+    if event.update_id in _skip_ids:
+        # Уже обработано во время догона
+        _skip_ids.discard(event.update_id)
+        return None
+    return await handler(event, data)
+
+
+class SendThrottle(BaseRequestMiddleware):
+    """
+    Request-middleware на время догона: ограничивает частоту запросов к Bot API
+    и повторяет запрос после TelegramRetryAfter.
+
+    Повторяется только HTTP-запрос, а не обновление целиком: хэндлер
+    коммитит запись до ответа, и повтор обновления продублировал бы её.
+    """
+
+    def __init__(self, rate: float = SEND_RATE, attempts: int = RETRY_AFTER_ATTEMPTS):
+        self.interval = 1 / rate
+        self.attempts = attempts
+        self._next_at = 0.0
+
+    async def _wait_turn(self) -> None:
+        now = asyncio.get_running_loop().time()
+        at = max(now, self._next_at)
+        self._next_at = at + self.interval
+        if at > now:
+            await asyncio.sleep(at - now)
+
+    async def __call__(self, make_request, bot, method):
+        if isinstance(method, GetUpdates):
+            return await make_request(bot, method)
+
+        for attempt in range(1, self.attempts + 1):
+            await self._wait_turn()
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == self.attempts:
+                    raise
+                metrics.inc('catchup_retry_after_total')
+                logging.warning('Flood control during catch-up, retrying in %ss', e.retry_after)
+                # Остальные запросы тоже ждут окончания блокировки
+                resume_at = asyncio.get_running_loop().time() + e.retry_after
+                self._next_at = max(self._next_at, resume_at)
+                await asyncio.sleep(e.retry_after)
+
+
+async def offset_flush_loop(session_pool: async_sessionmaker[AsyncSession], interval: int = FLUSH_INTERVAL):
+    """Периодически сохраняет последний update_id в БД"""
+    saved = None
+    while True:
+        await asyncio.sleep(interval)
+        if _last_update_id is not None and _last_update_id != saved:
+            try:
+                await save_offset(session_pool, _last_update_id)
+                saved = _last_update_id
+            except Exception:
+                logging.exception('Failed to persist update offset')
+
+
+def _user_key(update: Update) -> tuple:
+    user = getattr(update.event, 'from_user', None)
+    if user is not None:
+        return 'user', user.id
+    chat = getattr(update.event, 'chat', None)
+    if chat is not None:
+        return 'chat', chat.id
+    return 'update', update.update_id
+
+
+def _is_check_progress(update: Update) -> bool:
+    text = update.message.text if update.message else None
+    if not text or not text.startswith('/'):
+        return False
+    return text.split(maxsplit=1)[0].split('@')[0] == '/check_progress'
+
+
+def _collapse(queue: list[Update]) -> list[Update]:
+    """Оставляет только последний /check_progress пользователя: он и так увидит все записи до него"""
+    checks = [i for i, update in enumerate(queue) if _is_check_progress(update)]
+    if len(checks) < 2:
+        return queue
+    redundant = set(checks[:-1])
+    return [update for i, update in enumerate(queue) if i not in redundant]
+
+
+async def catch_up(
+    bot: Bot,
+    dp: Dispatcher,
+    session_pool: async_sessionmaker[AsyncSession],
+    concurrency: int = CONCURRENCY,
+) -> None:
+    """
+    Обрабатывает обновления, накопившиеся, пока бот был выключен.
+
+    Обновления забираются пачками, уже обработанные (update_id не больше
+    сохранённого) пропускаются. Обновления разных пользователей
+    обрабатываются параллельно, одного пользователя — строго по порядку.
+
+    Ответы отправляются через SendThrottle. Обновление, упавшее до коммита,
+    повторяется; упавшее после коммита (в after_commit или при форматировании
+    ответа) не повторяется, чтобы не продублировать запись. Если обновление
+    так и не обработано, догон
+    останавливается на нём: offset не сдвигается дальше, а Telegram отдаст
+    его и следующие обновления обычному polling (уже обработанные из них
+    пропускает track_update).
+    """
+    global _last_update_id
+
+    last_id = await load_offset(session_pool)
+    offset = last_id + 1 if last_id is not None else None
+    semaphore = asyncio.Semaphore(concurrency)
+    throttle = SendThrottle(SEND_RATE)
+    bot.session.middleware(throttle)
+    received = processed = collapsed = reply_failed = failed_after_commit = 0
+    started = time.perf_counter()
+
+    async def feed(update: Update) -> bool:
+        """Обрабатывает обновление; False, если транзакция так и не прошла"""
+        nonlocal reply_failed, failed_after_commit
+        for attempt in range(UPDATE_RETRIES + 1):
+            sessions = []
+            try:
+                await dp.feed_update(bot, update, db_sessions=sessions)
+                return True
+            except TelegramAPIError:
+                # Запись закоммичена до ответа, потерян только ответ
+                logging.exception('Failed to reply to update %s during catch-up', update.update_id)
+                reply_failed += 1
+                return True
+            except Exception:
+                if any(session.committed for session in sessions):
+                    # Повтор продублировал бы уже зафиксированную запись
+                    logging.exception('Update %s failed after commit during catch-up', update.update_id)
+                    failed_after_commit += 1
+                    return True
+                if attempt == UPDATE_RETRIES:
+                    logging.exception('Failed to process update %s during catch-up', update.update_id)
+                    return False
+                await asyncio.sleep(RETRY_DELAY * 2 ** attempt)
+
+    async def run_queue(queue: list[Update], handled: list[int]) -> int | None:
+        """Обрабатывает очередь пользователя по порядку; возвращает update_id, на котором она остановилась"""
+        nonlocal processed
+        async with semaphore:
+            for update in queue:
+                if not await feed(update):
+                    return update.update_id
+                handled.append(update.update_id)
+                processed += 1
+        return None
+
+    try:
+        while True:
+            updates = await bot.get_updates(offset=offset, limit=FETCH_LIMIT, timeout=0)
+            if not updates:
+                break
+            offset = updates[-1].update_id + 1
+
+            received += len(updates)
+            queues = defaultdict(list)
+            for update in updates:
+                if last_id is None or update.update_id > last_id:
+                    queues[_user_key(update)].append(update)
+
+            handled = []
+            for key, queue in queues.items():
+                queues[key] = _collapse(queue)
+                collapsed += len(queue) - len(queues[key])
+                kept = {update.update_id for update in queues[key]}
+                handled += [update.update_id for update in queue if update.update_id not in kept]
+
+            stopped = await asyncio.gather(*(run_queue(queue, handled) for queue in queues.values()))
+            stopped = [update_id for update_id in stopped if update_id is not None]
+
+            if stopped:
+                first_failed = min(stopped)
+                _skip_ids.update(update_id for update_id in handled if update_id > first_failed)
+                last_id = first_failed - 1
+                _last_update_id = last_id
+                await save_offset(session_pool, last_id)
+                # Подтверждаем только то, что до first_failed: остальное получит polling
+                await bot.get_updates(offset=first_failed, limit=1, timeout=0)
+                metrics.inc('catchup_updates_total', len(stopped), outcome='deferred')
+                logging.warning(
+                    'Catch-up stopped at update %d, %d user queues deferred to polling', first_failed, len(stopped)
+                )
+                break
+
+            last_id = updates[-1].update_id
+            _last_update_id = last_id
+            await save_offset(session_pool, last_id)
+    finally:
+        bot.session.middleware.unregister(throttle)
+
+    elapsed = time.perf_counter() - started
+    metrics.inc('catchup_updates_total', processed, outcome='processed')
+    metrics.inc('catchup_updates_total', collapsed, outcome='collapsed')
+    metrics.inc('catchup_updates_total', reply_failed, outcome='reply_failed')
+    metrics.inc('catchup_updates_total', failed_after_commit, outcome='failed_after_commit')
+    metrics.set_gauge('catchup_duration_seconds', elapsed)
+    logging.info(
+        'Catch-up: %d updates received, %d processed, %d collapsed in %.2fs (%.0f updates/s)',
+        received, processed, collapsed, elapsed, processed / elapsed if elapsed else 0,
+    )
@@ -0,0 +1,189 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from sqlalchemy import Row, bindparam, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+
+from database.models import User, DailyStats, Challenge, ChallengeMember
+from services.leaderboard import Leaderboard
+
+WATER = 'water'
+BURNED = 'burned'
+
+METRICS = {
+    WATER: 'дни с выполненной нормой воды',
+    BURNED: 'сожжённые калории',
+}
+
+challenges = Challenge.__table__
+members = ChallengeMember.__table__
+daily_stats = DailyStats.__table__
+
+_add_score = (
+    update(members)
+    .where(members.c.challenge_id == bindparam('b_challenge_id'), members.c.user_id == bindparam('b_user_id'))
+    .values(score=members.c.score + bindparam('d_score'))
+    .returning(members.c.score)
+)
+
+
+def week_start(day: date | None = None) -> date:
+    day = day or date.today()
+    return day - timedelta(days=day.weekday())
+
+
+def water_attainment_delta(stats: Row, water: int = 0, water_goal: int = 0) -> int:
+    """
+    Изменение числа дней с выполненной нормой воды после записи.
+
+    stats — дневная статистика уже после записи; water и water_goal —
+    на сколько запись изменила выпитое и норму.
+    """
+    def attained(total, goal):
+        return goal > 0 and total >= goal
+
+    before = attained(stats.total_water - water, stats.water_goal - water_goal)
+    after = attained(stats.total_water, stats.water_goal)
+    return int(after) - int(before)
+
+
+@dataclass
+class ActiveChallenge:
+    id: int
+    chat_id: int
+    metric: str
+    week_start: date
+    board: Leaderboard = field(default_factory=Leaderboard)
+    names: dict[int, str] = field(default_factory=dict)
+
+
+class ChallengeRegistry:
+    """
+    Челленджи текущей недели в памяти.
+
+    Рейтинги поддерживаются инкрементально при каждой записи в лог, поэтому
+    место участника и топ-N считаются за O(log n) без обхода DailyStats.
+    Счёт хранится в challenge_members и восстанавливается при старте.
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self) -> None:
+        self.week = week_start()
+        self.challenges: dict[int, ActiveChallenge] = {}
+        self.by_chat: dict[int, int] = {}
+        self.by_user: dict[int, set[int]] = defaultdict(set)
+        self.user_ids: dict[int, int] = {}
+
+    def _rollover(self) -> None:
+        current = week_start()
+        if current != self.week:
+            self._reset()
+
+    async def load(self, session_pool: async_sessionmaker[AsyncSession]) -> None:
+        """Загружает челленджи текущей недели и счёт участников из БД"""
+        self._reset()
+        async with session_pool() as session:
+            result = await session.execute(
+                select(challenges.c.id, challenges.c.chat_id, challenges.c.metric)
+                .where(challenges.c.week_start == self.week)
+            )
+            for row in result:
+                self.add_challenge(row.id, row.chat_id, row.metric)
+
+            result = await session.execute(
+                select(members.c.challenge_id, members.c.user_id, members.c.name, members.c.score, User.telegram_id)
+                .join(User, User.id == members.c.user_id)
+                .join(challenges, challenges.c.id == members.c.challenge_id)
+                .where(challenges.c.week_start == self.week)
+            )
+            for row in result:
+                self.add_member(row.challenge_id, row.user_id, row.telegram_id, row.name, row.score)
+
+    def current(self, chat_id: int) -> ActiveChallenge | None:
+        self._rollover()
+        challenge_id = self.by_chat.get(chat_id)
+        return self.challenges.get(challenge_id) if challenge_id is not None else None
+
+    def add_challenge(self, challenge_id: int, chat_id: int, metric: str) -> None:
+        self.challenges[challenge_id] = ActiveChallenge(challenge_id, chat_id, metric, self.week)
+        self.by_chat[chat_id] = challenge_id
+
+    def add_member(self, challenge_id: int, user_id: int, telegram_id: int, name: str, score: float) -> None:
+        challenge = self.challenges.get(challenge_id)
+        if challenge is None:
+            return
+        challenge.board.set(user_id, score)
+        challenge.names[user_id] = name
+        self.by_user[user_id].add(challenge_id)
+        self.user_ids[telegram_id] = user_id
+
+    async def create(self, session: AsyncSession, chat_id: int, metric: str) -> int | None:
+        """Создаёт челлендж недели; None, если в чате он уже есть (одновременный /challenge_start)"""
+        result = await session.execute(
+            insert(challenges)
+            .values(chat_id=chat_id, metric=metric, week_start=self.week)
+            .on_conflict_do_nothing(index_elements=['chat_id', 'week_start'])
+            .returning(challenges.c.id)
+        )
+        challenge_id = result.scalar_one_or_none()
+        if challenge_id is not None:
+            session.after_commit(lambda: self.add_challenge(challenge_id, chat_id, metric))
+        return challenge_id
+
+    async def join(
+        self, session: AsyncSession, challenge: ActiveChallenge, user_id: int, telegram_id: int, name: str
+    ) -> float | None:
+        """
+        Добавляет участника; стартовый счёт — его результат с начала недели.
+
+        Returns:
+            Стартовый счёт или None, если участник уже добавлен (одновременный /challenge_join)
+        """
+        week_filter = (
+            daily_stats.c.user_id == user_id,
+            daily_stats.c.stat_date >= challenge.week_start,
+        )
+        if challenge.metric == WATER:
+            query = select(func.count()).where(
+                *week_filter,
+                daily_stats.c.water_goal > 0,
+                daily_stats.c.total_water >= daily_stats.c.water_goal,
+            )
+        else:
+            query = select(func.coalesce(func.sum(daily_stats.c.burned_calories), 0)).where(*week_filter)
+        score = float((await session.execute(query)).scalar_one())
+
+        result = await session.execute(
+            insert(members)
+            .values(challenge_id=challenge.id, user_id=user_id, name=name, score=score)
+            .on_conflict_do_nothing(index_elements=['challenge_id', 'user_id'])
+            .returning(members.c.id)
+        )
+        if result.scalar_one_or_none() is None:
+            return None
+        session.after_commit(lambda: self.add_member(challenge.id, user_id, telegram_id, name, score))
+        return score
+
+    async def record(self, session: AsyncSession, user_id: int, metric: str, delta: float) -> None:
+        """Прибавляет delta к счёту пользователя во всех его челленджах с данной метрикой"""
+        self._rollover()
+        if not delta:
+            return
+
+        for challenge_id in list(self.by_user.get(user_id, ())):
+            challenge = self.challenges[challenge_id]
+            if challenge.metric != metric:
+                continue
+
+            result = await session.execute(
+                _add_score, {'b_challenge_id': challenge_id, 'b_user_id': user_id, 'd_score': delta}
+            )
+            score = result.scalar_one()
+            session.after_commit(lambda board=challenge.board, score=score: board.set(user_id, score))
+
+
+registry = ChallengeRegistry()
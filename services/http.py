@@ -0,0 +1,29 @@
+import aiohttp
+
+_session: aiohttp.ClientSession | None = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Общая HTTP-сессия процесса (пул соединений переиспользуется между запросами)"""
+    global _session
+
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession()
+    return _session
+
+
+async def close_session() -> None:
+    global _session
+
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+def open_connections() -> int:
+    """Открытые соединения общей сессии: занятые запросами и простаивающие в пуле"""
+    if _session is None or _session.closed or _session.connector is None:
+        return 0
+    connector = _session.connector
+    # Публичного счётчика у aiohttp нет: _acquired — занятые, _conns — простаивающие по хостам
+    return len(connector._acquired) + sum(len(conns) for conns in connector._conns.values())
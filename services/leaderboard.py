@@ -0,0 +1,156 @@
+import random
+
+from typing import Any, Iterator
+
+
+class _Node:
+    __slots__ = ('key', 'priority', 'left', 'right', 'size')
+
+    def __init__(self, key: Any):
+        self.key = key
+        self.priority = random.random()
+        self.left: _Node | None = None
+        self.right: _Node | None = None
+        self.size = 1
+
+
+def _size(node: _Node | None) -> int:
+    return node.size if node is not None else 0
+
+
+def _update(node: _Node) -> _Node:
+    node.size = 1 + _size(node.left) + _size(node.right)
+    return node
+
+
+def _split(node: _Node | None, key: Any) -> tuple[_Node | None, _Node | None]:
+    """Делит дерево на ключи < key и >= key"""
+    if node is None:
+        return None, None
+    if node.key < key:
+        left, right = _split(node.right, key)
+        node.right = left
+        return _update(node), right
+    left, right = _split(node.left, key)
+    node.left = right
+    return left, _update(node)
+
+
+def _merge(left: _Node | None, right: _Node | None) -> _Node | None:
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _update(left)
+    right.left = _merge(left, right.left)
+    return _update(right)
+
+
+def _remove(node: _Node | None, key: Any) -> _Node | None:
+    if node is None:
+        return None
+    if node.key == key:
+        return _merge(node.left, node.right)
+    if key < node.key:
+        node.left = _remove(node.left, key)
+    else:
+        node.right = _remove(node.right, key)
+    return _update(node)
+
+
+class OrderStatisticTree:
+    """
+    Декартово дерево (treap) с размерами поддеревьев.
+
+    Вставка, удаление, ранг ключа и поиск k-го элемента — O(log n) в среднем.
+    Ключи должны быть уникальными и сравнимыми.
+    """
+
+    def __init__(self):
+        self._root: _Node | None = None
+
+    def __len__(self) -> int:
+        return _size(self._root)
+
+    def insert(self, key: Any) -> None:
+        left, right = _split(self._root, key)
+        self._root = _merge(_merge(left, _Node(key)), right)
+
+    def remove(self, key: Any) -> None:
+        self._root = _remove(self._root, key)
+
+    def rank(self, key: Any) -> int:
+        """Количество ключей, строго меньших key"""
+        node, rank = self._root, 0
+        while node is not None:
+            if node.key < key:
+                rank += _size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return rank
+
+    def select(self, index: int) -> Any:
+        """Ключ с порядковым номером index (с нуля)"""
+        node = self._root
+        while node is not None:
+            left = _size(node.left)
+            if index < left:
+                node = node.left
+            elif index == left:
+                return node.key
+            else:
+                index -= left + 1
+                node = node.right
+        raise IndexError(index)
+
+    def __iter__(self) -> Iterator[Any]:
+        stack, node = [], self._root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.key
+            node = node.right
+
+
+class Leaderboard:
+    """Рейтинг участников: чем больше очков, тем выше место"""
+
+    def __init__(self):
+        self._tree = OrderStatisticTree()
+        self._scores: dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._scores
+
+    def score(self, user_id: int) -> float | None:
+        return self._scores.get(user_id)
+
+    def set(self, user_id: int, score: float) -> None:
+        old = self._scores.get(user_id)
+        if old is not None:
+            self._tree.remove((-old, user_id))
+        self._tree.insert((-score, user_id))
+        self._scores[user_id] = score
+
+    def rank(self, user_id: int) -> int | None:
+        """Место участника, начиная с 1"""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return self._tree.rank((-score, user_id)) + 1
+
+    def top(self, n: int) -> list[tuple[int, float]]:
+        result = []
+        for neg_score, user_id in self._tree:
+            if len(result) >= n:
+                break
+            result.append((user_id, -neg_score))
+        return result
@@ -0,0 +1,40 @@
+from collections import defaultdict
+
+# Простейший реестр метрик процесса: счётчики и gauge с метками.
+# Ключ — (имя, отсортированные пары меток).
+_counters: dict[tuple, float] = defaultdict(float)
+_gauges: dict[tuple, float] = {}
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    """Увеличивает счётчик"""
+    _counters[_key(name, labels)] += value
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    """Устанавливает текущее значение gauge"""
+    _gauges[_key(name, labels)] = value
+
+
+def get(name: str, **labels) -> float:
+    """Текущее значение счётчика или gauge (0, если метрики нет)"""
+    key = _key(name, labels)
+    return _gauges.get(key, _counters.get(key, 0))
+
+
+def render() -> str:
+    """Все метрики в текстовом формате Prometheus"""
+    lines = []
+    for kind, values in (('counter', _counters), ('gauge', _gauges)):
+        seen = set()
+        for (name, labels), value in sorted(values.items()):
+            if name not in seen:
+                lines.append(f'# TYPE {name} {kind}')
+                seen.add(name)
+            label_str = ','.join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f'{name}{{{label_str}}} {value:g}' if label_str else f'{name} {value:g}')
+    return '\n'.join(lines) + '\n'
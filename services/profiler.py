@@ -0,0 +1,174 @@
+import asyncio
+import inspect
+import os
+import sys
+import threading
+import time
+
+from collections import Counter
+from dataclasses import dataclass, field
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+
+IDLE = '<idle>'
+OTHER = '<other>'
+
+_lock = asyncio.Lock()
+
+
+@dataclass
+class ProfileResult:
+    duration: float
+    interval: float
+    samples: int = 0
+    stacks: Counter = field(default_factory=Counter)
+    handlers: Counter = field(default_factory=Counter)
+    leaves: Counter = field(default_factory=Counter)
+    loop_lag: list[float] = field(default_factory=list)
+    sampler_cpu: float = 0.0
+    path: str | None = None
+
+    def lag_percentile(self, q: float) -> float:
+        if not self.loop_lag:
+            return 0.0
+        ordered = sorted(self.loop_lag)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+    def summary(self, top: int = 10) -> str:
+        """Краткий отчёт: доли хэндлеров, самые горячие функции и лаг event loop"""
+        busy = self.samples - self.handlers.get(IDLE, 0)
+        lines = [
+            f'Сэмплов: {self.samples} за {self.duration:.0f} с '
+            f'(шаг {self.interval * 1000:.0f} мс), занят: {busy / max(self.samples, 1) * 100:.1f}%',
+            f'CPU сэмплера: {self.sampler_cpu / max(self.duration, 1e-9) * 100:.2f}%',
+            f'Лаг event loop: p50 {self.lag_percentile(0.5) * 1000:.1f} мс, '
+            f'p99 {self.lag_percentile(0.99) * 1000:.1f} мс, '
+            f'max {max(self.loop_lag, default=0) * 1000:.1f} мс',
+            '',
+            'Хэндлеры:',
+        ]
+        for name, count in self.handlers.most_common(top):
+            lines.append(f'  {count / max(self.samples, 1) * 100:5.1f}%  {name}')
+
+        lines += ['', 'Горячие функции (self):']
+        for name, count in self.leaves.most_common(top):
+            lines.append(f'  {count / max(busy, 1) * 100:5.1f}%  {name}')
+
+        return '\n'.join(lines)
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+def handler_codes(router) -> set:
+    """
+    Объекты кода всех хэндлеров, зарегистрированных в роутере и его дочерних роутерах.
+
+    По ним сэмплы атрибутируются хэндлерам: outer-middlewares и внутренние
+    функции aiogram в этот набор не попадают.
+    """
+    from aiogram import Router
+
+    codes = set()
+    for child in router.chain_tail:
+        for observer in child.observers.values():
+            for handler in observer.handlers:
+                callback = inspect.unwrap(handler.callback)
+                # Dispatcher сам зарегистрирован на update (_listen_update) — это не хэндлер бота
+                if inspect.ismethod(callback) and isinstance(callback.__self__, Router):
+                    continue
+                code = getattr(callback, '__code__', None)
+                if code is not None:
+                    codes.add(code)
+    return codes
+
+
+def _is_idle(frame) -> bool:
+    # Event loop ждёт событий в selector.select()
+    return frame.f_code.co_name in ('select', 'poll', 'epoll', 'control') and 'selectors' in frame.f_code.co_filename
+
+
+def _sample(thread_id: int, handlers: set, result: ProfileResult, stop: threading.Event) -> None:
+    """Цикл сэмплирования; выполняется в отдельном потоке"""
+    cpu_started = time.thread_time()
+    while not stop.wait(result.interval):
+        frame = sys._current_frames().get(thread_id)
+        if frame is None:
+            break
+
+        result.samples += 1
+        if _is_idle(frame):
+            result.handlers[IDLE] += 1
+            continue
+
+        stack = []
+        handler = OTHER
+        leaf = frame
+        while frame is not None:
+            stack.append(_frame_name(frame))
+            # Первый хэндлер от листа к корню — тот, что сейчас выполняется
+            if handler is OTHER and frame.f_code in handlers:
+                handler = frame.f_code.co_name
+            frame = frame.f_back
+
+        stack.reverse()
+        result.stacks[';'.join(stack)] += 1
+        result.handlers[handler] += 1
+        result.leaves[_frame_name(leaf)] += 1
+
+    result.sampler_cpu = time.thread_time() - cpu_started
+
+
+async def _measure_lag(result: ProfileResult, stop: threading.Event, tick: float = 0.05) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + tick
+        await asyncio.sleep(tick)
+        result.loop_lag.append(max(0.0, loop.time() - expected))
+
+
+def _write_collapsed(result: ProfileResult) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, count in result.stacks.most_common():
+            f.write(f'{stack} {count}\n')
+    return path
+
+
+def is_running() -> bool:
+    return _lock.locked()
+
+
+async def profile(duration: float, handlers: set, interval: float = 0.01) -> ProfileResult:
+    """
+    Сэмплирует стек потока event loop в течение duration секунд.
+
+    handlers — объекты кода хэндлеров (см. handler_codes), которым
+    атрибутируются сэмплы.
+
+    Сэмплер работает в отдельном потоке и читает кадры через
+    sys._current_frames(), поэтому сам event loop не замедляется.
+    Результат сохраняется в файл collapsed-stack (формат flamegraph.pl / speedscope).
+    """
+    async with _lock:
+        result = ProfileResult(duration=duration, interval=interval)
+        stop = threading.Event()
+        loop_thread = threading.get_ident()
+
+        sampler = threading.Thread(
+            target=_sample, args=(loop_thread, handlers, result, stop), name='profiler', daemon=True
+        )
+        lag_task = asyncio.create_task(_measure_lag(result, stop))
+        sampler.start()
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            stop.set()
+            await lag_task
+            await asyncio.to_thread(sampler.join)
+
+        result.path = await asyncio.to_thread(_write_collapsed, result)
+        return result
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import time
+
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+import aiohttp
+
+from services import metrics
+
+T = TypeVar('T')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Запрос отклонён без обращения к внешнему сервису: предохранитель разомкнут"""
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """
+    Считается ли ошибка отказом сервиса для предохранителя.
+
+    Отказ — таймаут, ошибка соединения или ответ 5xx. Ответы 4xx (неизвестный
+    город, неизвестный штрихкод) означают, что сервис работает: из-за
+    опечаток пользователей предохранитель не должен размыкаться для всех.
+    """
+    if isinstance(error, (asyncio.TimeoutError, aiohttp.ClientConnectionError)):
+        return True
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status >= 500
+    return False
+
+
+class LatencyTracker:
+    """Скользящее окно задержек успешных запросов для оценки p95"""
+
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+
+    def add(self, latency: float) -> None:
+        self.samples.append(latency)
+
+    def percentile(self, q: float) -> float | None:
+        if len(self.samples) < 20:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для внешнего сервиса.
+
+    После failure_threshold ошибок подряд размыкается и reset_timeout секунд
+    сразу отклоняет запросы. Затем пропускает один пробный запрос:
+    успех замыкает цепь, ошибка снова размыкает.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self.state = CLOSED
+        self._probe_in_flight = False
+        self._export_state()
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            logging.warning('Circuit breaker %s: %s -> %s', self.name, self.state, state)
+            self.state = state
+            self._export_state()
+
+    def _export_state(self) -> None:
+        metrics.set_gauge('upstream_breaker_state', _STATE_VALUES[self.state], upstream=self.name)
+
+    def allow(self) -> bool:
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self._set_state(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probe_in_flight = False
+        self._set_state(CLOSED)
+
+    def record_cancel(self) -> None:
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state(OPEN)
+
+
+class Upstream:
+    """
+    Обёртка над обращениями к одному внешнему сервису.
+
+    Args:
+        name: Имя сервиса (метка в метриках)
+        timeout: Жёсткий бюджет на запрос в секундах, включая хедж
+        hedge: Отправлять ли дублирующий запрос, если первый дольше p95
+        hedge_min_delay: Нижняя граница задержки перед хеджем
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float,
+        hedge: bool = False,
+        hedge_min_delay: float = 0.05,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+        self.latency = LatencyTracker()
+
+    async def call(self, make_request: Callable[[], Awaitable[T]]) -> T:
+        """
+        Выполняет запрос с учётом предохранителя, таймаута и хеджирования.
+
+        Raises:
+            CircuitOpenError: предохранитель разомкнут, запрос не отправлялся
+            asyncio.TimeoutError: бюджет времени исчерпан
+
+        Ошибки самого запроса пробрасываются как есть; отказами для
+        предохранителя считаются только те, что проходят is_upstream_failure.
+        """
+        if not self.breaker.allow():
+            metrics.inc('upstream_requests_total', upstream=self.name, outcome='rejected')
+            raise CircuitOpenError(self.name)
+
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self._hedged(make_request), self.timeout)
+        except asyncio.CancelledError:
+            self.breaker.record_cancel()
+            raise
+        except asyncio.TimeoutError:
+            self.breaker.record_failure()
+            metrics.inc('upstream_requests_total', upstream=self.name, outcome='timeout')
+            raise
+        except Exception as e:
+            if is_upstream_failure(e):
+                self.breaker.record_failure()
+                metrics.inc('upstream_requests_total', upstream=self.name, outcome='error')
+            else:
+                # Сервис ответил, ошибка в самом запросе
+                self.breaker.record_success()
+                metrics.inc('upstream_requests_total', upstream=self.name, outcome='client_error')
+            raise
+
+        self.breaker.record_success()
+        self.latency.add(time.monotonic() - started)
+        metrics.inc('upstream_requests_total', upstream=self.name, outcome='success')
+        return result
+
+    async def _hedged(self, make_request: Callable[[], Awaitable[T]]) -> T:
+        delay = self.latency.percentile(0.95) if self.hedge else None
+        if delay is None:
+            return await make_request()
+
+        tasks = [asyncio.ensure_future(make_request())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=max(delay, self.hedge_min_delay))
+            if done:
+                return tasks[0].result()
+
+            metrics.inc('upstream_hedges_total', upstream=self.name)
+            tasks.append(asyncio.ensure_future(make_request()))
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is tasks[1]:
+                            metrics.inc('upstream_hedge_wins_total', upstream=self.name)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
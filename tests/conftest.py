@@ -0,0 +1,66 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+from aiogram import Bot
+from aiogram.methods import SendMessage
+
+# Модули бота читают настройки при импорте, поэтому тестовая БД задаётся до них
+_workdir = tempfile.mkdtemp(prefix='bot-tests-')
+os.environ['DATABASE_URL'] = f"sqlite+aiosqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ['TOKEN'] = '42:TEST'
+os.environ['ADMIN_IDS'] = ''
+os.environ.pop('OPENWEATHER_API_KEY', None)
+
+
+class StubTelegram:
+    """
+    Заглушка Bot API из tools.soak, которая записывает тексты отправленных сообщений.
+
+    intercept(method) вызывается до заглушки: он может ответить на запрос
+    сам (вернуть не None) или бросить исключение, как это сделал бы Telegram.
+    """
+
+    def __init__(self, intercept=None):
+        from tools.soak import make_stub_session
+
+        self.replies: list[str] = []
+        self.session = make_stub_session()
+        make_request = self.session.make_request
+
+        async def request(bot, method, timeout=None):
+            if intercept is not None:
+                response = await intercept(method)
+                if response is not None:
+                    return response
+            if isinstance(method, SendMessage):
+                self.replies.append(method.text)
+            return await make_request(bot, method, timeout)
+
+        self.session.make_request = request
+
+    def bot(self) -> Bot:
+        return Bot(token='42:TEST', session=self.session)
+
+
+@pytest.fixture(scope='session')
+def dp():
+    """Диспетчер бота со всеми роутерами и middlewares над тестовой БД"""
+    import main
+    from database.engine import engine, init_db
+
+    async def setup():
+        await init_db()
+        await engine.dispose()
+
+    asyncio.run(setup())
+    main.setup_dispatcher()
+    return main.dp
+
+
+@pytest.fixture
+def stub_telegram():
+    """Фабрика заглушек Bot API: stub_telegram(intercept=None) -> StubTelegram"""
+    return StubTelegram
@@ -0,0 +1,44 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from services.backup import create_backup, verify_backup
+
+
+def _fill(path: str, rows: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE IF NOT EXISTS t (id INTEGER PRIMARY KEY)')
+    conn.executemany('INSERT INTO t (id) VALUES (?)', ((i,) for i in range(rows)))
+    conn.commit()
+    return conn
+
+
+def test_restore_discards_stale_wal():
+    """Восстановление поверх упавшей WAL-БД: оставшийся -wal не применяется к копии"""
+    workdir = tempfile.mkdtemp(prefix='backup-')
+    source = os.path.join(workdir, 'source.db')
+    _fill(source, 5).close()
+    backup = create_backup(source, os.path.join(workdir, 'backups'))
+
+    live = os.path.join(workdir, 'live.db')
+    conn = _fill(os.path.join(workdir, 'running.db'), 1000)
+    conn.execute('PRAGMA wal_autocheckpoint=0')
+    conn.executemany('INSERT INTO t (id) VALUES (?)', ((i,) for i in range(1000, 2000)))
+    conn.commit()
+    # Снимок файлов работающей БД — как после падения процесса: строки только в -wal
+    for suffix in ('', '-wal', '-shm'):
+        shutil.copyfile(os.path.join(workdir, 'running.db' + suffix), live + suffix)
+    conn.close()
+    with sqlite3.connect(f'file:{live}?mode=ro', uri=True) as crashed:
+        assert crashed.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 2000
+
+    manifest = verify_backup(backup, restore_to=live)
+
+    assert manifest['tables'] == {'t': 5}
+    assert not any(os.path.exists(live + suffix) for suffix in ('-wal', '-shm'))
+    with sqlite3.connect(live) as restored:
+        assert restored.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 5
+    # Временный каталог рядом с целью удалён
+    assert not [name for name in os.listdir(workdir) if name.startswith('tmp')]
@@ -0,0 +1,118 @@
+import asyncio
+import os
+
+import pytest
+
+from services import barcode, metrics
+from tools.barcode_bench import ean13
+
+
+def _die(image: bytes) -> None:
+    os._exit(1)
+
+
+def _no_zbar(image: bytes) -> None:
+    raise ImportError('Unable to find zbar shared library')
+
+
+def test_unknown_barcode_is_a_miss(monkeypatch):
+    import database.utils
+    from services.http import close_session
+    from tools.soak import start_stub_upstreams
+
+    async def scenario():
+        runner = await start_stub_upstreams()
+        monkeypatch.setattr(database.utils, 'OPENFOODFACTS_URL', f'http://127.0.0.1:{runner.addresses[0][1]}')
+        try:
+            # Заглушка отвечает 404 на коды, оканчивающиеся на 0
+            unknown = [await database.utils.get_product_by_barcode('4006381333930') for _ in range(5)]
+            known = await database.utils.get_product_by_barcode(ean13('400638133393'))
+        finally:
+            await close_session()
+            await runner.cleanup()
+        return unknown, known
+
+    unknown, known = asyncio.run(scenario())
+
+    assert unknown == [None] * 5
+    assert known['product_name'] == 'продукт 4006381333931'
+    assert database.utils.food_upstream.breaker.failures == 0
+
+
+def test_dead_worker_resets_pool(monkeypatch):
+    async def scenario():
+        monkeypatch.setattr(barcode, 'decode_barcode', _die)
+        with pytest.raises(barcode.BarcodeDecodeError):
+            await barcode.decode(b'image')
+        assert barcode._pool is None
+
+        monkeypatch.setattr(barcode, 'decode_barcode', len)
+        try:
+            return await barcode.decode(b'image')
+        finally:
+            await barcode.shutdown_pool()
+
+    assert asyncio.run(scenario()) == 5
+    assert metrics.get('barcode_decodes_total', outcome='pool_broken') == 1
+
+
+def test_broken_images_are_decode_errors(monkeypatch):
+    from tools.barcode_bench import render_ean13
+
+    truncated = render_ean13(ean13('460000000001'))[:-200]
+
+    async def scenario():
+        try:
+            with pytest.raises(barcode.BarcodeDecodeError, match='truncated'):
+                await barcode.decode(truncated)
+            monkeypatch.setattr(barcode, 'decode_barcode', _no_zbar)
+            with pytest.raises(barcode.BarcodeDecodeError, match='zbar'):
+                await barcode.decode(b'image')
+        finally:
+            await barcode.shutdown_pool()
+
+    asyncio.run(scenario())
+    assert metrics.get('barcode_decodes_total', outcome='invalid_image') == 1
+    assert metrics.get('barcode_decodes_total', outcome='error') == 1
+
+
+def test_photo_is_downloaded_and_looked_up(dp, monkeypatch, stub_telegram):
+    import database.utils
+    import routers.progress
+    from services.http import close_session
+    from tools.soak import PROFILE_FLOW, barcode_photo, make_photo_update, make_update, start_stub_upstreams
+
+    telegram_id = 80_001
+    known, unknown = ean13('460000000001'), '4600000000020'
+    photos = {barcode_photo(code): code for code in (known, unknown)}
+    telegram = stub_telegram()
+    replies = telegram.replies
+
+    async def fake_decode(image: bytes) -> str | None:
+        # Распознавание требует libzbar, здесь проверяется скачанный файл
+        return photos[image]
+
+    async def scenario():
+        from database.engine import engine
+
+        runner = await start_stub_upstreams()
+        monkeypatch.setattr(database.utils, 'OPENFOODFACTS_URL', f'http://127.0.0.1:{runner.addresses[0][1]}')
+        bot = telegram.bot()
+        try:
+            for i, text in enumerate(PROFILE_FLOW):
+                await dp.feed_update(bot, make_update(800_000 + i, telegram_id, text))
+            replies.clear()
+            await dp.feed_update(bot, make_photo_update(800_100, telegram_id, known))
+            await dp.feed_update(bot, make_update(800_101, telegram_id, '150'))
+            await dp.feed_update(bot, make_photo_update(800_102, telegram_id, unknown))
+        finally:
+            await close_session()
+            await runner.cleanup()
+            await engine.dispose()
+
+    monkeypatch.setattr(routers.progress, 'decode_barcode', fake_decode)
+    asyncio.run(scenario())
+
+    assert f'продукт {known}' in replies[0]
+    assert 'Записано: 150 г' in replies[1]
+    assert f'штрихкодом {unknown} не найден' in replies[2]
@@ -0,0 +1,177 @@
+import asyncio
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import GetUpdates, SendMessage
+from sqlalchemy import func, select
+
+from database.models import User, WaterLog
+from services import catchup
+from services.challenges import registry
+from tools.soak import PROFILE_FLOW, make_update
+
+
+class TelegramQueue:
+    """
+    Очередь обновлений на стороне Telegram (intercept для stub_telegram):
+    getUpdates с offset подтверждает (удаляет) обновления с меньшим update_id.
+    Первые flood_errors сообщений отклоняются флуд-контролем, повторная
+    отправка того же сообщения проходит.
+    """
+
+    def __init__(self, updates: list, flood_errors: int = 0):
+        self.pending = list(updates)
+        self.flood_errors = flood_errors
+        self.rejected = set()
+
+    async def __call__(self, method):
+        if isinstance(method, GetUpdates):
+            if method.offset is not None:
+                self.pending = [u for u in self.pending if u.update_id >= method.offset]
+            return self.pending[:method.limit]
+        if isinstance(method, SendMessage):
+            if len(self.rejected) < self.flood_errors and id(method) not in self.rejected:
+                self.rejected.add(id(method))
+                raise TelegramRetryAfter(method=method, message='Too Many Requests', retry_after=0)
+        return None
+
+
+async def water_logs(telegram_id: int) -> int:
+    from database.engine import session_maker
+
+    async with session_maker() as session:
+        return await session.scalar(
+            select(func.count()).select_from(WaterLog).join(User).where(User.telegram_id == telegram_id)
+        )
+
+
+async def setup_profiles(dp, bot, telegram_ids: list[int], first_update_id: int) -> int:
+    update_id = first_update_id
+    for telegram_id in telegram_ids:
+        for text in PROFILE_FLOW:
+            await dp.feed_update(bot, make_update(update_id, telegram_id, text))
+            update_id += 1
+    return update_id
+
+
+def run(coro):
+    async def wrapper():
+        from database.engine import engine
+        from services.http import close_session
+
+        try:
+            return await coro
+        finally:
+            await close_session()
+            await engine.dispose()
+
+    return asyncio.run(wrapper())
+
+
+def test_flood_control_does_not_lose_updates(dp, monkeypatch, stub_telegram):
+    from database.engine import session_maker
+
+    telegram_ids = [50_001, 50_002, 50_003]
+
+    async def scenario():
+        update_id = await setup_profiles(dp, stub_telegram().bot(), telegram_ids, 500_000)
+        await catchup.save_offset(session_maker, update_id - 1)
+
+        updates = []
+        for i in range(150):
+            updates.append(make_update(update_id + i, telegram_ids[i % 3], '/log_water 100'))
+        queue = TelegramQueue(updates, flood_errors=40)
+        telegram = stub_telegram(queue)
+
+        await catchup.catch_up(telegram.bot(), dp, session_maker)
+
+        counts = [await water_logs(telegram_id) for telegram_id in telegram_ids]
+        return queue, telegram, counts, await catchup.load_offset(session_maker), updates[-1].update_id
+
+    monkeypatch.setattr(catchup, 'SEND_RATE', 1000)
+    queue, telegram, counts, offset, last = run(scenario())
+
+    assert counts == [50, 50, 50]
+    assert len(queue.rejected) == 40
+    assert len(telegram.replies) == 150
+    assert offset == last
+    assert queue.pending == []
+
+
+def test_failed_update_is_left_for_polling(dp, monkeypatch, stub_telegram):
+    from database.engine import session_maker
+
+    telegram_ids = [60_001, 60_002]
+    record = registry.record
+    failing = set()
+
+    async def flaky_record(session, user_id, metric, delta):
+        # Постоянная ошибка БД для одного пользователя: транзакция откатывается
+        if user_id in failing:
+            raise RuntimeError('injected')
+        return await record(session, user_id, metric, delta)
+
+    async def scenario():
+        update_id = await setup_profiles(dp, stub_telegram().bot(), telegram_ids, 600_000)
+        await catchup.save_offset(session_maker, update_id - 1)
+        from database.queries import get_user_brief
+
+        async with session_maker() as session:
+            failing.add((await get_user_brief(session, telegram_ids[0])).id)
+
+        updates = [
+            make_update(update_id, telegram_ids[1], '/log_water 100'),
+            make_update(update_id + 1, telegram_ids[0], '/log_water 100'),
+            make_update(update_id + 2, telegram_ids[1], '/log_water 100'),
+            make_update(update_id + 3, telegram_ids[0], '/log_water 200'),
+        ]
+        queue = TelegramQueue(updates)
+        bot = stub_telegram(queue).bot()
+        await catchup.catch_up(bot, dp, session_maker)
+        offset = await catchup.load_offset(session_maker)
+        counts_after_catchup = [await water_logs(telegram_id) for telegram_id in telegram_ids]
+
+        # Polling получает обновления заново; уже обработанные пропускаются
+        failing.clear()
+        redelivered = [u.update_id for u in queue.pending]
+        for update in queue.pending:
+            await dp.feed_update(bot, update)
+        counts_after_polling = [await water_logs(telegram_id) for telegram_id in telegram_ids]
+        return updates, offset, redelivered, counts_after_catchup, counts_after_polling
+
+    monkeypatch.setattr(registry, 'record', flaky_record)
+    monkeypatch.setattr(catchup, 'RETRY_DELAY', 0.01)
+    updates, offset, redelivered, after_catchup, after_polling = run(scenario())
+
+    first_failed = updates[1].update_id
+    assert offset == first_failed - 1
+    assert redelivered == [u.update_id for u in updates[1:]]
+    assert after_catchup == [0, 2]
+    assert after_polling == [2, 2]
+
+
+def test_update_failed_after_commit_is_not_replayed(dp, monkeypatch, stub_telegram):
+    from database.engine import session_maker
+
+    telegram_id = 65_001
+
+    async def scenario():
+        update_id = await setup_profiles(dp, stub_telegram().bot(), [telegram_id], 650_000)
+        await catchup.save_offset(session_maker, update_id - 1)
+
+        updates = [make_update(update_id + i, telegram_id, '/log_water 100') for i in range(2)]
+        queue = TelegramQueue(updates)
+
+        async def intercept(method):
+            # Ошибка после коммита, но не ошибка Bot API
+            if isinstance(method, SendMessage) and '100' in method.text:
+                raise RuntimeError('injected')
+            return await queue(method)
+
+        await catchup.catch_up(stub_telegram(intercept).bot(), dp, session_maker)
+        return await water_logs(telegram_id), await catchup.load_offset(session_maker), updates[-1].update_id
+
+    monkeypatch.setattr(catchup, 'RETRY_DELAY', 0.01)
+    logs, offset, last = run(scenario())
+
+    assert logs == 2
+    assert offset == last
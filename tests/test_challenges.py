@@ -0,0 +1,64 @@
+import asyncio
+import itertools
+
+from sqlalchemy import func, select
+
+from database.models import Challenge, ChallengeMember
+from services.challenges import registry
+from tools.soak import PROFILE_FLOW, make_update
+
+_update_ids = itertools.count(700_000)
+
+
+async def count(model, *where) -> int:
+    from database.engine import session_maker
+
+    async with session_maker() as session:
+        return await session.scalar(select(func.count()).select_from(model).where(*where))
+
+
+def test_concurrent_start_and_join(dp, stub_telegram):
+    chat_id = -70_001
+    telegram_id = 70_001
+
+    telegram = stub_telegram()
+    replies = telegram.replies
+
+    async def scenario():
+        from database.engine import engine
+        from services.http import close_session
+
+        bot = telegram.bot()
+        try:
+            for text in PROFILE_FLOW:
+                await dp.feed_update(bot, make_update(next(_update_ids), telegram_id, text))
+            replies.clear()
+
+            # Оба обновления проходят проверку registry.current до коммита первого
+            await asyncio.gather(*(
+                dp.feed_update(bot, make_update(next(_update_ids), telegram_id, '/challenge_start', chat_id))
+                for _ in range(2)
+            ))
+            start_replies = list(replies)
+            replies.clear()
+
+            await asyncio.gather(*(
+                dp.feed_update(bot, make_update(next(_update_ids), telegram_id, '/challenge_join', chat_id))
+                for _ in range(2)
+            ))
+            challenges = await count(Challenge, Challenge.chat_id == chat_id)
+            challenge = registry.current(chat_id)
+            members = await count(ChallengeMember, ChallengeMember.challenge_id == challenge.id)
+            return start_replies, challenges, members, len(challenge.board)
+        finally:
+            await close_session()
+            await engine.dispose()
+
+    start_replies, challenges, members, board = asyncio.run(scenario())
+
+    assert challenges == 1
+    assert sum('запущен!' in text for text in start_replies) == 1
+    assert sum('уже' in text for text in start_replies) == 1
+    assert members == 1 and board == 1
+    assert sum('в игре' in text for text in replies) == 1
+    assert sum('уже участвуете' in text for text in replies) == 1
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from database.engine import Base
+from database.migrations import migrate, SCHEMA_VERSION
+
+import database.models  # noqa: F401
+
+
+def _schema(conn) -> dict:
+    inspector = inspect(conn)
+    return {
+        table: {
+            'columns': sorted(column['name'] for column in inspector.get_columns(table)),
+            'indexes': sorted(index['name'] for index in inspector.get_indexes(table)),
+            'unique': sorted(tuple(c['column_names']) for c in inspector.get_unique_constraints(table)),
+        }
+        for table in inspector.get_table_names() if table != 'schema_version'
+    }
+
+
+async def _migrated_schema(path: str) -> tuple[int, int, dict]:
+    engine = create_async_engine(f'sqlite+aiosqlite:///{path}')
+    try:
+        async with engine.begin() as conn:
+            before = await migrate(conn)
+        async with engine.begin() as conn:
+            again = await migrate(conn)
+            return before, again, await conn.run_sync(_schema)
+    finally:
+        await engine.dispose()
+
+
+def _models_schema() -> dict:
+    path = os.path.join(tempfile.mkdtemp(prefix='schema-'), 'models.db')
+    engine = create_async_engine(f'sqlite+aiosqlite:///{path}')
+
+    async def build():
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                return await conn.run_sync(_schema)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(build())
+
+
+def test_migrations_match_models():
+    """Новая БД после всех миграций совпадает со схемой моделей"""
+    path = os.path.join(tempfile.mkdtemp(prefix='schema-'), 'fresh.db')
+    before, again, schema = asyncio.run(_migrated_schema(path))
+
+    assert before == 0
+    assert again == SCHEMA_VERSION
+    assert schema == _models_schema()
+
+
+def test_unversioned_database_gets_missing_tables():
+    """БД без schema_version (создана create_all старой версии) дополняется, данные остаются"""
+    path = os.path.join(tempfile.mkdtemp(prefix='schema-'), 'legacy.db')
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE users (id INTEGER NOT NULL, telegram_id INTEGER NOT NULL, username VARCHAR, '
+                     'weight FLOAT, height INTEGER, age INTEGER, gender VARCHAR, activity_minutes INTEGER, '
+                     'city VARCHAR, water_goal INTEGER, calorie_goal INTEGER, '
+                     'created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME, PRIMARY KEY (id))')
+        conn.execute('INSERT INTO users (telegram_id) VALUES (7)')
+
+    before, _, schema = asyncio.run(_migrated_schema(path))
+
+    assert before == 0
+    assert set(schema) == set(Base.metadata.tables)
+    with sqlite3.connect(path) as conn:
+        assert conn.execute('SELECT telegram_id FROM users').fetchall() == [(7,)]
+
+
+def test_duplicate_challenges_are_merged():
+    """Миграция 2 сливает дубликаты челленджа недели до создания уникального индекса"""
+    from database.migrations import SCHEMA_V1
+
+    path = os.path.join(tempfile.mkdtemp(prefix='schema-'), 'v1.db')
+    with sqlite3.connect(path) as conn:
+        for statement in SCHEMA_V1:
+            conn.execute(statement)
+        conn.execute('CREATE TABLE schema_version (version INTEGER NOT NULL)')
+        conn.execute('INSERT INTO schema_version (version) VALUES (1)')
+        conn.executemany('INSERT INTO users (id, telegram_id) VALUES (?, ?)', [(1, 1), (2, 2), (3, 3)])
+        conn.executemany(
+            "INSERT INTO challenges (id, chat_id, metric, week_start) VALUES (?, -1, 'water', '2026-10-12')",
+            [(1,), (2,)],
+        )
+        # Пользователь 2 вступил в оба дубликата, 3 — только во второй
+        conn.executemany(
+            'INSERT INTO challenge_members (challenge_id, user_id, score) VALUES (?, ?, 0)',
+            [(1, 1), (1, 2), (2, 2), (2, 3)],
+        )
+
+    before, _, schema = asyncio.run(_migrated_schema(path))
+
+    assert before == 1
+    assert 'uq_challenges_chat_id_week_start' in schema['challenges']['indexes']
+    with sqlite3.connect(path) as conn:
+        assert conn.execute('SELECT id FROM challenges').fetchall() == [(1,)]
+        assert conn.execute(
+            'SELECT challenge_id, user_id FROM challenge_members ORDER BY user_id'
+        ).fetchall() == [(1, 1), (1, 2), (1, 3)]
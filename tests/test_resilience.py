@@ -0,0 +1,213 @@
+import asyncio
+import itertools
+import time
+
+import aiohttp
+import pytest
+
+from aiohttp import web
+
+from services import metrics
+from services.resilience import CircuitOpenError, Upstream, CLOSED, HALF_OPEN, OPEN
+
+_names = itertools.count()
+
+
+class FaultyServer:
+    """Локальная заглушка внешнего API: статус и задержка ответа задаются тестом"""
+
+    def __init__(self):
+        self.status = 200
+        self.delays: list[float] = []
+        self.hits = 0
+        self.runner: web.AppRunner | None = None
+        self.url = ''
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.hits += 1
+        if self.delays:
+            await asyncio.sleep(self.delays.pop(0))
+        return web.json_response({'hit': self.hits}, status=self.status)
+
+    async def __aenter__(self) -> 'FaultyServer':
+        app = web.Application()
+        app.router.add_get('/', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        self.url = f'http://127.0.0.1:{self.runner.addresses[0][1]}/'
+        self.session = aiohttp.ClientSession()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.session.close()
+        await self.runner.cleanup()
+
+    async def fetch(self) -> dict:
+        async with self.session.get(self.url) as response:
+            response.raise_for_status()
+            return await response.json()
+
+
+def make_upstream(**kwargs) -> Upstream:
+    kwargs.setdefault('timeout', 1.0)
+    kwargs.setdefault('failure_threshold', 3)
+    kwargs.setdefault('reset_timeout', 0.2)
+    return Upstream(f'test{next(_names)}', **kwargs)
+
+
+async def fail(upstream: Upstream, server: FaultyServer, times: int) -> None:
+    for _ in range(times):
+        with pytest.raises(aiohttp.ClientResponseError):
+            await upstream.call(server.fetch)
+
+
+def test_breaker_opens_after_consecutive_5xx():
+    async def scenario():
+        async with FaultyServer() as server:
+            upstream = make_upstream()
+            server.status = 503
+            await fail(upstream, server, 3)
+            assert upstream.breaker.state == OPEN
+
+            with pytest.raises(CircuitOpenError):
+                await upstream.call(server.fetch)
+            assert server.hits == 3
+            assert metrics.get('upstream_requests_total', upstream=upstream.name, outcome='rejected') == 1
+
+    asyncio.run(scenario())
+
+
+def test_client_errors_do_not_open_breaker():
+    async def scenario():
+        async with FaultyServer() as server:
+            upstream = make_upstream()
+            server.status = 404
+            await fail(upstream, server, 10)
+            assert upstream.breaker.state == CLOSED
+            assert server.hits == 10
+            assert metrics.get('upstream_requests_total', upstream=upstream.name, outcome='client_error') == 10
+
+    asyncio.run(scenario())
+
+
+def test_client_error_resets_failure_streak():
+    async def scenario():
+        async with FaultyServer() as server:
+            upstream = make_upstream()
+            server.status = 500
+            await fail(upstream, server, 2)
+            server.status = 404
+            await fail(upstream, server, 1)
+            server.status = 500
+            await fail(upstream, server, 2)
+            assert upstream.breaker.state == CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_connection_errors_open_breaker():
+    async def scenario():
+        async with FaultyServer() as server:
+            url = server.url
+        # Сервер остановлен: соединение отклоняется
+        upstream = make_upstream()
+        async with aiohttp.ClientSession() as session:
+            async def fetch():
+                async with session.get(url) as response:
+                    return await response.json()
+
+            for _ in range(3):
+                with pytest.raises(aiohttp.ClientConnectionError):
+                    await upstream.call(fetch)
+        assert upstream.breaker.state == OPEN
+
+    asyncio.run(scenario())
+
+
+def test_half_open_probe_success_closes_breaker():
+    async def scenario():
+        async with FaultyServer() as server:
+            upstream = make_upstream()
+            server.status = 500
+            await fail(upstream, server, 3)
+
+            await asyncio.sleep(upstream.breaker.reset_timeout)
+            server.status = 200
+            # Пока пробный запрос не завершился, остальные отклоняются
+            server.delays = [0.1]
+            probe = asyncio.create_task(upstream.call(server.fetch))
+            await asyncio.sleep(0.02)
+            assert upstream.breaker.state == HALF_OPEN
+            with pytest.raises(CircuitOpenError):
+                await upstream.call(server.fetch)
+
+            assert await probe == {'hit': 4}
+            assert upstream.breaker.state == CLOSED
+            assert await upstream.call(server.fetch) == {'hit': 5}
+
+    asyncio.run(scenario())
+
+
+def test_half_open_probe_failure_reopens_breaker():
+    async def scenario():
+        async with FaultyServer() as server:
+            upstream = make_upstream()
+            server.status = 500
+            await fail(upstream, server, 3)
+
+            await asyncio.sleep(upstream.breaker.reset_timeout)
+            await fail(upstream, server, 1)
+            assert upstream.breaker.state == OPEN
+            with pytest.raises(CircuitOpenError):
+                await upstream.call(server.fetch)
+            assert server.hits == 4
+
+    asyncio.run(scenario())
+
+
+def test_latency_budget_cancels_slow_request():
+    async def scenario():
+        async with FaultyServer() as server:
+            upstream = make_upstream(timeout=0.2)
+            server.delays = [2.0]
+            started = time.monotonic()
+            with pytest.raises(asyncio.TimeoutError):
+                await upstream.call(server.fetch)
+            assert time.monotonic() - started < 0.5
+            assert upstream.breaker.failures == 1
+            assert metrics.get('upstream_requests_total', upstream=upstream.name, outcome='timeout') == 1
+
+    asyncio.run(scenario())
+
+
+def test_hedge_wins_when_first_request_stalls():
+    async def scenario():
+        async with FaultyServer() as server:
+            upstream = make_upstream(hedge=True, hedge_min_delay=0.02)
+            # Набираем окно задержек, чтобы появилась оценка p95
+            for _ in range(25):
+                await upstream.call(server.fetch)
+
+            server.delays = [1.5, 0.0]
+            started = time.monotonic()
+            result = await upstream.call(server.fetch)
+            assert time.monotonic() - started < 0.5
+            assert result == {'hit': 27}
+            assert metrics.get('upstream_hedges_total', upstream=upstream.name) == 1
+            assert metrics.get('upstream_hedge_wins_total', upstream=upstream.name) == 1
+
+    asyncio.run(scenario())
+
+
+def test_no_hedge_when_first_request_is_fast():
+    async def scenario():
+        async with FaultyServer() as server:
+            upstream = make_upstream(hedge=True, hedge_min_delay=0.2)
+            for _ in range(25):
+                await upstream.call(server.fetch)
+            assert server.hits == 25
+            assert metrics.get('upstream_hedges_total', upstream=upstream.name) == 0
+
+    asyncio.run(scenario())
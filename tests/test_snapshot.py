@@ -0,0 +1,65 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+
+from datetime import date
+
+from analytics import snapshot
+from analytics.reports import Snapshot
+from database.migrations import SCHEMA_V1
+
+
+def test_export_encodes_dates_and_strings(monkeypatch):
+    workdir = tempfile.mkdtemp(prefix='snapshot-')
+    db_path = os.path.join(workdir, 'bot.db')
+    names = ['Банан', ' банан ', None, 'Хлеб', 'Яблоко', 'хлеб']
+    log_dates = ['2026-10-19', None, '2025-01-31 10:00:00']
+    with sqlite3.connect(db_path) as conn:
+        for statement in SCHEMA_V1:
+            conn.execute(statement)
+        conn.execute("INSERT INTO users (id, telegram_id, city) VALUES (1, 1, 'Москва')")
+        conn.executemany(
+            'INSERT INTO food_logs (user_id, food_name, calories, amount, log_date) VALUES (1, ?, ?, ?, ?)',
+            [(names[i % len(names)] or '', 10.0 * i, None if i % 4 else 100.0, log_dates[i % 3]) for i in range(30)],
+        )
+
+    # Маленькие пачки: новые значения словаря появляются и после первой
+    monkeypatch.setattr(snapshot, 'CHUNK_SIZE', 4)
+    exported = Snapshot(snapshot.export_snapshot(db_path, os.path.join(workdir, 'snapshots')))
+
+    vocab = exported.vocab('food_logs', 'food_name')
+    assert vocab == ['банан', '', 'хлеб', 'яблоко']
+    decoded = [vocab[code] for code in exported.column('food_logs', 'food_name')]
+    assert decoded == [(names[i % len(names)] or '').strip().lower() for i in range(30)]
+
+    ordinals = {'2026-10-19': date(2026, 10, 19).toordinal(), None: 0, '2025-01-31 10:00:00': date(2025, 1, 31).toordinal()}
+    assert exported.column('food_logs', 'log_date').tolist() == [ordinals[log_dates[i % 3]] for i in range(30)]
+    assert exported.column('food_logs', 'amount').tolist() == [0.0 if i % 4 else 100.0 for i in range(30)]
+    assert exported.column('food_logs', 'calories').tolist() == [10.0 * i for i in range(30)]
+
+
+def test_exports_do_not_overlap(monkeypatch):
+    """Выгрузка по расписанию и /admin_snapshot не пишут LATEST.tmp одновременно"""
+    running = []
+    overlaps = []
+
+    def slow_export() -> str:
+        running.append(1)
+        overlaps.append(len(running))
+        time.sleep(0.05)
+        running.pop()
+        return 'snapshot'
+
+    async def scenario():
+        first = asyncio.create_task(snapshot.run_export())
+        await asyncio.sleep(0)
+        assert snapshot.is_running()
+        return await asyncio.gather(first, snapshot.run_export())
+
+    monkeypatch.setattr(snapshot, 'export_snapshot', slow_export)
+
+    assert asyncio.run(scenario()) == ['snapshot', 'snapshot']
+    assert overlaps == [1, 1]
+    assert not snapshot.is_running()
@@ -0,0 +1,126 @@
+import asyncio
+import itertools
+import random
+
+import pytest
+
+from aiogram.exceptions import TelegramNetworkError
+from sqlalchemy import select
+
+from database.models import User
+from database.queries import daily_stats, STATS_COLUMNS
+from database.stats_cache import CachedStats, stats_cache
+from tools.soak import PROFILE_FLOW, make_update, start_stub_upstreams
+
+_update_ids = itertools.count(1)
+
+
+class InjectedError(Exception):
+    pass
+
+
+def flaky_sends(rng: random.Random, faults: dict):
+    """intercept для stub_telegram: доля faults['send'] запросов к Bot API падает сетевой ошибкой"""
+    async def intercept(method):
+        if rng.random() < faults['send']:
+            raise TelegramNetworkError(method=method, message='injected')
+        return None
+
+    return intercept
+
+
+async def db_stats(telegram_ids: list[int]) -> dict[int, CachedStats]:
+    from database.engine import session_maker
+
+    async with session_maker() as session:
+        result = await session.execute(
+            select(User.telegram_id, *STATS_COLUMNS).join(User, User.id == daily_stats.c.user_id)
+            .where(User.telegram_id.in_(telegram_ids))
+        )
+        return {row.telegram_id: CachedStats.from_row(row) for row in result}
+
+
+def random_command(rng: random.Random) -> list[str]:
+    kind = rng.choice(['water', 'water', 'food', 'workout', 'check', 'check'])
+    if kind == 'water':
+        return [f'/log_water {rng.randint(50, 700)}']
+    if kind == 'food':
+        return ['/log_food банан', str(rng.randint(10, 400))]
+    if kind == 'workout':
+        return [f"/log_workout {rng.choice(['бег', 'йога', 'силовая'])} {rng.randint(5, 90)}"]
+    return ['/check_progress']
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_cache_matches_database_under_random_failures(dp, seed, monkeypatch, stub_telegram):
+    """
+    Случайные записи нескольких пользователей вперемешку, часть обновлений
+    падает (сеть Bot API или ошибка между записью кэша и коммитом). После
+    прогона каждая запись кэша совпадает со строкой daily_stats в БД.
+    """
+    import database.utils
+
+    rng = random.Random(seed)
+    telegram_ids = [seed * 1000 + i for i in range(1, 6)]
+
+    faults = {'db': 0.0, 'send': 0.0}
+    failures = {'db': 0, 'send': 0}
+    put = stats_cache.put
+
+    def flaky_put(telegram_id, stats):
+        cached = put(telegram_id, stats)
+        # Кэш уже обновлён, транзакция ещё не закоммичена
+        if rng.random() < faults['db']:
+            raise InjectedError()
+        return cached
+
+    monkeypatch.setattr(stats_cache, 'put', flaky_put)
+
+    async def scenario():
+        from database.engine import engine
+        from services.http import close_session
+
+        runner = await start_stub_upstreams()
+        monkeypatch.setattr(database.utils, 'OPENFOODFACTS_URL', f'http://127.0.0.1:{runner.addresses[0][1]}')
+        bot = stub_telegram(flaky_sends(rng, faults)).bot()
+
+        async def send(telegram_id: int, text: str):
+            try:
+                await dp.feed_update(bot, make_update(next(_update_ids), telegram_id, text))
+            except InjectedError:
+                failures['db'] += 1
+            except TelegramNetworkError:
+                failures['send'] += 1
+
+        async def user_flow(telegram_id: int):
+            for _ in range(40):
+                for text in random_command(rng):
+                    await send(telegram_id, text)
+                await asyncio.sleep(0)
+
+        try:
+            for telegram_id in telegram_ids:
+                for text in PROFILE_FLOW:
+                    await send(telegram_id, text)
+
+            faults.update(db=0.15, send=0.1)
+            await asyncio.gather(*(user_flow(telegram_id) for telegram_id in telegram_ids))
+            faults.update(db=0.0, send=0.0)
+
+            expected = await db_stats(telegram_ids)
+        finally:
+            await close_session()
+            await runner.cleanup()
+            await engine.dispose()
+        return expected
+
+    expected = asyncio.run(scenario())
+
+    assert failures['db'] > 0 and failures['send'] > 0
+    checked = 0
+    for telegram_id in telegram_ids:
+        cached = stats_cache.get(telegram_id)
+        if cached is not None:
+            assert cached == expected[telegram_id]
+            checked += 1
+    assert checked > 0
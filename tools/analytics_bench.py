@@ -0,0 +1,185 @@
+"""
+Бенчмарк аналитики /admin_stats.
+
+1. Выгрузка: временная БД с --export-rows строками в каждой таблице снимка,
+   `analytics.snapshot.export_snapshot` — время и строк в секунду.
+2. Отчёты: снимок на --rows строк (по умолчанию 50M: 40% daily_stats,
+   50% food_logs, 10% workout_logs) пишется прямо в формате колоночных
+   файлов, без SQLite, после чего `analytics.reports.build_report` считается
+   несколько раз — первый прогон с холодными mmap и повторные.
+
+Код возврата 1, если медиана повторных прогонов отчёта дольше
+--max-report-seconds.
+
+    python -m tools.analytics_bench --rows 50000000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from datetime import date
+
+# Доли строк по таблицам и размеры словарей синтетического снимка
+SHARES = {'daily_stats': 0.4, 'food_logs': 0.5, 'workout_logs': 0.1}
+VOCAB_SIZES = {'city': 200, 'food_name': 5000, 'workout_type': 12}
+DAYS = 365
+WRITE_CHUNK = 5_000_000
+
+
+def fill_database(db_path: str, rows: int) -> None:
+    rng = random.Random(1)
+    today = date.today().toordinal()
+    cities = [f'город {i}' for i in range(VOCAB_SIZES['city'])] + [None]
+    foods = [f'продукт {i}' for i in range(VOCAB_SIZES['food_name'])]
+    workouts = [f'тренировка {i}' for i in range(VOCAB_SIZES['workout_type'])]
+
+    def day() -> str:
+        return date.fromordinal(today - rng.randrange(DAYS)).isoformat()
+
+    conn = sqlite3.connect(db_path)
+    try:
+        users = max(1, rows // 100)
+        conn.executemany(
+            'INSERT INTO users (id, telegram_id, city) VALUES (?, ?, ?)',
+            ((i, i, rng.choice(cities)) for i in range(1, users + 1)),
+        )
+        conn.executemany(
+            'INSERT INTO daily_stats (user_id, stat_date, total_water, water_goal, total_calories, '
+            'burned_calories, calorie_goal) VALUES (?, ?, ?, 2000, ?, ?, 2200)',
+            ((rng.randint(1, users), day(), rng.randrange(3000), rng.random() * 3000, rng.random() * 500)
+             for _ in range(rows)),
+        )
+        conn.executemany(
+            'INSERT INTO food_logs (user_id, food_name, calories, amount, log_date) VALUES (?, ?, ?, ?, ?)',
+            ((rng.randint(1, users), rng.choice(foods), rng.random() * 500, 100.0, day()) for _ in range(rows)),
+        )
+        conn.executemany(
+            'INSERT INTO workout_logs (user_id, workout_type, duration, calories_burned, log_date) '
+            'VALUES (?, ?, ?, ?, ?)',
+            ((rng.randint(1, users), rng.choice(workouts), 30, 250.0, day()) for _ in range(rows)),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+async def bench_export(db_path: str, rows: int) -> None:
+    from analytics.snapshot import export_snapshot
+    from database.engine import engine, init_db
+
+    # Схема создаётся миграциями бота, выгрузка читает файл БД напрямую
+    await init_db()
+    await engine.dispose()
+
+    started = time.perf_counter()
+    await asyncio.to_thread(fill_database, db_path, rows)
+    print(f'Filled {rows} rows per table in {time.perf_counter() - started:.1f}s')
+
+    started = time.perf_counter()
+    await asyncio.to_thread(export_snapshot, db_path, os.environ['SNAPSHOT_DIR'])
+    elapsed = time.perf_counter() - started
+    print(f'Export: {3 * rows} rows in {elapsed:.2f}s ({3 * rows / elapsed / 1e6:.2f}M rows/s)')
+
+
+def write_snapshot(path: str, rows: int, seed: int) -> None:
+    """Синтетический снимок в формате export_snapshot: колонки .bin и meta.json"""
+    import numpy as np
+
+    from analytics.snapshot import TABLES
+
+    rng = np.random.default_rng(seed)
+    today = date.today().toordinal()
+    os.makedirs(path)
+    tables = {}
+    for table, (_, _, columns) in TABLES.items():
+        count = int(rows * SHARES[table])
+        files = {col: open(os.path.join(path, f'{table}.{col}.bin'), 'wb') for col, _, _ in columns}
+        try:
+            for start in range(0, count, WRITE_CHUNK):
+                n = min(WRITE_CHUNK, count - start)
+                for col, kind, _ in columns:
+                    if kind == 'date':
+                        values = today - rng.integers(0, DAYS, n, dtype='int32')
+                    elif kind == 'code':
+                        # Популярность значений неравномерна, как у реальных продуктов и городов
+                        values = np.minimum(rng.zipf(1.3, n) - 1, VOCAB_SIZES[col] - 1).astype('int32')
+                    elif kind == 'int32':
+                        values = rng.integers(1, rows // 100 + 2, n, dtype='int32')
+                    else:
+                        values = (rng.random(n, dtype='float32') * 3000).astype(kind)
+                    values.tofile(files[col])
+        finally:
+            for f in files.values():
+                f.close()
+        tables[table] = {
+            'rows': count,
+            'columns': {col: ('int32' if kind in ('code', 'date') else kind) for col, kind, _ in columns},
+            'vocabs': {col: [f'{col} {i}' for i in range(VOCAB_SIZES[col])]
+                       for col, kind, _ in columns if kind == 'code'},
+        }
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'created_at': time.time(), 'tables': tables}, f, ensure_ascii=False)
+
+
+def bench_reports(args: argparse.Namespace) -> float:
+    from analytics.reports import build_report, Snapshot
+
+    path = os.path.join(tempfile.mkdtemp(prefix='analytics-report-'), 'snapshot')
+    started = time.perf_counter()
+    write_snapshot(path, args.rows, args.seed)
+    size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+    print(f'Wrote {args.rows / 1e6:.0f}M-row snapshot ({size / 2**20:.0f}MB) in {time.perf_counter() - started:.1f}s')
+
+    timings = []
+    for _ in range(args.repeat + 1):
+        snapshot = Snapshot(path)
+        started = time.perf_counter()
+        report = build_report(snapshot, args.days)
+        timings.append(time.perf_counter() - started)
+
+    print(f"Report over {args.days} days: first {timings[0]:.3f}s, then median {statistics.median(timings[1:]):.3f}s, "
+          f"max {max(timings[1:]):.3f}s; {report['attainment']['days']} daily_stats rows in window")
+    return statistics.median(timings[1:])
+
+
+def main(args: argparse.Namespace) -> int:
+    workdir = tempfile.mkdtemp(prefix='analytics-bench-')
+    db_path = os.path.join(workdir, 'bench.db')
+    # Модули бота читают настройки при импорте, поэтому задаются до них
+    os.environ['DATABASE_URL'] = f'sqlite+aiosqlite:///{db_path}'
+    os.environ['SNAPSHOT_DIR'] = os.path.join(workdir, 'snapshots')
+
+    if args.export_rows:
+        asyncio.run(bench_export(db_path, args.export_rows))
+
+    median = bench_reports(args)
+    if median > args.max_report_seconds:
+        print(f'\nFAILED:\n  report median {median:.2f}s (limit {args.max_report_seconds:.1f}s)')
+        return 1
+
+    print('\nOK')
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Analytics snapshot export and report benchmark')
+    parser.add_argument('--rows', type=int, default=50_000_000, help='строк в синтетическом снимке')
+    parser.add_argument('--export-rows', type=int, default=1_000_000, help='строк в каждой таблице БД; 0 — без выгрузки')
+    parser.add_argument('--days', type=int, default=30, help='окно отчёта')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-report-seconds', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main(parse_args()))
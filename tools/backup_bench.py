@@ -0,0 +1,144 @@
+"""
+Бенчмарк онлайн-бэкапа под постоянной записью.
+
+Создаёт временную БД со схемой бота заданного размера, запускает писателя,
+который каждые --write-interval мс коммитит запись в water_logs через движок
+бота (aiosqlite, WAL), и снимает бэкап через `services.backup.run_backup`.
+Задержка коммитов писателя измеряется до бэкапа и во время него, лаг event
+loop — во время бэкапа. Код возврата 1, если бэкап не завершился за --timeout,
+писатель получал ошибки или p99 коммита во время бэкапа выше порога.
+
+    python -m tools.backup_bench --size-mb 350 --write-interval 20
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from datetime import date
+
+FILL_BATCH = 50_000
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def fill_database(db_path: str, size_mb: float) -> int:
+    """Добавляет строки в food_logs, пока файл БД не вырастет до size_mb; возвращает id пользователя"""
+    conn = sqlite3.connect(db_path)
+    try:
+        user_id = conn.execute(
+            'INSERT INTO users (telegram_id, weight, water_goal, calorie_goal) VALUES (1, 70, 2000, 2000) '
+            'RETURNING id'
+        ).fetchone()[0]
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        # Длинное название продукта, чтобы набрать размер меньшим числом строк
+        name = 'бенчмарк ' * 20
+        today = date.today().isoformat()
+        while conn.execute('PRAGMA page_count').fetchone()[0] * page_size < size_mb * 2**20:
+            conn.executemany(
+                'INSERT INTO food_logs (user_id, food_name, calories, amount, log_date) VALUES (?, ?, ?, ?, ?)',
+                ((user_id, name, 100.0, 100.0, today) for _ in range(FILL_BATCH)),
+            )
+            conn.commit()
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return user_id
+    finally:
+        conn.close()
+
+
+async def writer(session_maker, user_id: int, interval: float, latencies: list[float], errors: list[str]) -> None:
+    """Коммитит по одной записи воды каждые interval секунд, как хэндлер /log_water"""
+    from database.queries import add_water_log
+
+    while True:
+        started = time.perf_counter()
+        try:
+            async with session_maker() as session:
+                await add_water_log(session, user_id, 250, date.today())
+                await session.commit()
+        except Exception as e:
+            errors.append(repr(e))
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+
+
+def _describe(latencies: list[float]) -> str:
+    return (f'{len(latencies)} commits, p50 {_percentile(latencies, 0.5) * 1000:.1f}ms, '
+            f'p99 {_percentile(latencies, 0.99) * 1000:.1f}ms, max {max(latencies, default=0) * 1000:.1f}ms')
+
+
+async def bench(args: argparse.Namespace) -> int:
+    workdir = tempfile.mkdtemp(prefix='backup-bench-')
+    db_path = os.path.join(workdir, 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite+aiosqlite:///{db_path}'
+    os.environ['BACKUP_DIR'] = os.path.join(workdir, 'backups')
+
+    # Модули бота читают настройки при импорте, поэтому импортируются здесь
+    from database.engine import engine, init_db, session_maker
+    from services.backup import run_backup
+
+    await init_db()
+    started = time.perf_counter()
+    user_id = await asyncio.to_thread(fill_database, db_path, args.size_mb)
+    print(f'Filled {os.path.getsize(db_path) / 2**20:.0f}MB in {time.perf_counter() - started:.1f}s')
+
+    baseline: list[float] = []
+    during: list[float] = []
+    errors: list[str] = []
+
+    task = asyncio.create_task(writer(session_maker, user_id, args.write_interval / 1000, baseline, errors))
+    failures = []
+    try:
+        await asyncio.sleep(args.baseline)
+        task.cancel()
+        task = asyncio.create_task(writer(session_maker, user_id, args.write_interval / 1000, during, errors))
+        result = await asyncio.wait_for(run_backup(db_path), args.timeout)
+    except asyncio.TimeoutError:
+        result = None
+        failures.append(f'backup did not finish in {args.timeout:.0f}s')
+    finally:
+        task.cancel()
+        await engine.dispose()
+
+    print(f'Writer before backup: {_describe(baseline)}')
+    print(f'Writer during backup: {_describe(during)}')
+    if result is not None:
+        print(f'Backup: {result.size / 2**20:.1f}MB compressed in {result.duration:.1f}s, '
+              f'loop lag p99 {result.lag_p99 * 1000:.1f}ms, max {result.lag_max * 1000:.1f}ms')
+
+    p99 = _percentile(during, 0.99) * 1000
+    if p99 > args.max_write_p99_ms:
+        failures.append(f'commit p99 during backup {p99:.0f}ms (limit {args.max_write_p99_ms:.0f}ms)')
+    if errors:
+        failures.append(f'{len(errors)} writes failed, first: {errors[0]}')
+
+    if failures:
+        print('\nFAILED:\n  ' + '\n  '.join(failures))
+        return 1
+
+    print('\nOK')
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Online backup benchmark under write load')
+    parser.add_argument('--size-mb', type=float, default=350, help='размер БД')
+    parser.add_argument('--write-interval', type=float, default=20, help='период коммитов писателя, мс')
+    parser.add_argument('--baseline', type=float, default=3, help='сколько секунд мерить писателя до бэкапа')
+    parser.add_argument('--timeout', type=float, default=120, help='лимит на бэкап, с')
+    parser.add_argument('--max-write-p99-ms', type=float, default=100)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(bench(parse_args())))
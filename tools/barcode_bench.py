@@ -0,0 +1,212 @@
+"""
+Бенчмарк распознавания штрихкодов и поиска продукта.
+
+Рисует EAN-13 (Pillow), сохраняет как JPEG, как их присылает Telegram, и
+прогоняет путь хэндлера фото: `services.barcode.decode` в пуле процессов →
+`product_index` → OpenFoodFacts (локальная заглушка из `tools.soak`) при
+промахе → пополнение индекса. Часть кодов заглушка «не знает» (404).
+Печатает пропускную способность, задержки распознавания и поиска, лаг
+event loop и исходы. Код возврата 1, если пропускная способность ниже
+--min-rate или были ошибки.
+
+    python -m tools.barcode_bench --images 2000 --distinct 300 --concurrency 16
+
+Распознавание требует системной библиотеки libzbar; --lookup-only мерит
+только поиск продукта.
+"""
+import argparse
+import asyncio
+import io
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Кодировка цифр EAN-13: L-коды, R — их инверсия, G — R задом наперёд
+_L = ['0001101', '0011001', '0010011', '0111101', '0100011', '0110001', '0101111', '0111011', '0110111', '0001011']
+_R = [code.translate(str.maketrans('01', '10')) for code in _L]
+_G = [code[::-1] for code in _R]
+# Чётность левой половины по первой цифре
+_PARITY = ['LLLLLL', 'LLGLGG', 'LLGGLG', 'LLGGGL', 'LGLLGG', 'LGGLLG', 'LGGGLG', 'LGLGLG', 'LGLGGL', 'LGGLGL']
+
+MODULE_PX = 3
+QUIET_MODULES = 11
+BAR_HEIGHT = 160
+
+
+def ean13(prefix: str) -> str:
+    """Дополняет 12 цифр контрольной"""
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(prefix))
+    return prefix + str((10 - total % 10) % 10)
+
+
+def render_ean13(code: str) -> bytes:
+    from PIL import Image, ImageDraw
+
+    first, left, right = int(code[0]), code[1:7], code[7:]
+    bits = '101'
+    for digit, parity in zip(left, _PARITY[first]):
+        bits += (_L if parity == 'L' else _G)[int(digit)]
+    bits += '01010'
+    for digit in right:
+        bits += _R[int(digit)]
+    bits += '101'
+
+    width = (len(bits) + 2 * QUIET_MODULES) * MODULE_PX
+    img = Image.new('L', (width, BAR_HEIGHT + 40), 255)
+    draw = ImageDraw.Draw(img)
+    for i, bit in enumerate(bits):
+        if bit == '1':
+            x = (QUIET_MODULES + i) * MODULE_PX
+            draw.rectangle([x, 20, x + MODULE_PX - 1, 20 + BAR_HEIGHT], fill=0)
+
+    buffer = io.BytesIO()
+    img.convert('RGB').save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def _describe(values: list[float]) -> str:
+    return (f'p50 {_percentile(values, 0.5) * 1000:.1f}ms, p99 {_percentile(values, 0.99) * 1000:.1f}ms, '
+            f'max {max(values, default=0) * 1000:.1f}ms')
+
+
+async def bench(args: argparse.Namespace) -> int:
+    from tools.soak import measure_lag, start_stub_upstreams, SoakState
+
+    runner = await start_stub_upstreams()
+    workdir = tempfile.mkdtemp(prefix='barcode-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['OPENFOODFACTS_URL'] = f'http://127.0.0.1:{runner.addresses[0][1]}'
+
+    # Модули бота читают настройки при импорте, поэтому импортируются здесь
+    from database.engine import engine, init_db, session_maker
+    from database.product_index import product_index
+    from database.utils import get_product_by_barcode, parse_nutrition
+    from middlewares.db import LazySession
+    from services import metrics
+    from services.barcode import decode, shutdown_pool
+    from services.http import close_session
+
+    if not args.lookup_only:
+        try:
+            import pyzbar.pyzbar  # noqa: F401
+        except ImportError as e:
+            print(f'pyzbar is unavailable ({e}); install libzbar or use --lookup-only')
+            await runner.cleanup()
+            return 1
+
+    await init_db()
+    await product_index.load(session_maker)
+
+    rng = random.Random(args.seed)
+    codes = [ean13(f'{rng.randrange(10**12):012d}') for _ in range(args.distinct)]
+    images = {code: render_ean13(code) for code in codes}
+    print(f'Rendered {len(images)} EAN-13 images, avg {sum(map(len, images.values())) / len(images) / 1024:.1f}KB')
+
+    decode_times: list[float] = []
+    lookup_times: list[float] = []
+    errors: list[str] = []
+    outcomes = {'decoded': 0, 'wrong_code': 0, 'not_found': 0}
+
+    async def process(code: str) -> None:
+        started = time.perf_counter()
+        if args.lookup_only:
+            barcode = code
+        else:
+            barcode = await decode(images[code])
+            decode_times.append(time.perf_counter() - started)
+            if barcode != code:
+                outcomes['wrong_code'] += 1
+                return
+            outcomes['decoded'] += 1
+
+        started = time.perf_counter()
+        food = product_index.get(barcode)
+        metrics.inc('product_index_total', outcome='hit' if food else 'miss')
+        if food is None:
+            product = await get_product_by_barcode(barcode)
+            if product is None:
+                outcomes['not_found'] += 1
+            else:
+                # Как в хэндлере: индекс пополняется после коммита
+                session = LazySession(session_maker)
+                try:
+                    await product_index.add(session, barcode, parse_nutrition(product, barcode))
+                    await session.finish(commit=True)
+                except BaseException:
+                    await session.finish(commit=False)
+                    raise
+        lookup_times.append(time.perf_counter() - started)
+
+    queue = [rng.choice(codes) for _ in range(args.images)]
+
+    async def worker() -> None:
+        while queue:
+            code = queue.pop()
+            try:
+                await process(code)
+            except Exception as e:
+                errors.append(repr(e))
+
+    state = SoakState()
+    lag_task = asyncio.create_task(measure_lag(state, tick=0.01))
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    finally:
+        elapsed = time.perf_counter() - started
+        lag_task.cancel()
+        await shutdown_pool()
+        await close_session()
+        await runner.cleanup()
+        await engine.dispose()
+
+    rate = args.images / elapsed
+    print(f'{args.images} images in {elapsed:.2f}s: {rate:.0f}/s with concurrency {args.concurrency}')
+    if decode_times:
+        print(f'Decode: {_describe(decode_times)}')
+    print(f'Lookup: {_describe(lookup_times)}')
+    print(f"Index: {metrics.get('product_index_total', outcome='hit'):.0f} hits, "
+          f"{metrics.get('product_index_total', outcome='miss'):.0f} misses, {len(product_index)} products")
+    print(f'Outcomes: {outcomes}')
+    print(f'Loop lag: p99 {_percentile(state.lag, 0.99) * 1000:.1f}ms, max {max(state.lag, default=0) * 1000:.1f}ms')
+
+    failures = []
+    if rate < args.min_rate:
+        failures.append(f'throughput {rate:.0f}/s (limit {args.min_rate:.0f}/s)')
+    if outcomes['wrong_code']:
+        failures.append(f"{outcomes['wrong_code']} images decoded to a wrong code")
+    if errors:
+        failures.append(f'{len(errors)} images failed, first: {errors[0]}')
+
+    if failures:
+        print('\nFAILED:\n  ' + '\n  '.join(failures))
+        return 1
+
+    print('\nOK')
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Barcode decode and product lookup benchmark')
+    parser.add_argument('--images', type=int, default=2000, help='сколько фото обработать')
+    parser.add_argument('--distinct', type=int, default=300, help='сколько разных штрихкодов')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--lookup-only', action='store_true', help='без распознавания (нет libzbar)')
+    parser.add_argument('--min-rate', type=float, default=0, help='минимум фото в секунду')
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(bench(parse_args())))
@@ -0,0 +1,186 @@
+"""
+Бенчмарк рейтингов челленджей на больших группах.
+
+Создаёт временную БД с группой из --members участников челленджа по
+сожжённым калориям и их статистикой за неделю, затем измеряет:
+загрузку челленджей при старте, операции рейтинга в памяти (место
+участника и топ-10), `/leaderboard` и `/log_workout` через настоящие
+роутеры с заглушкой Bot API, и для сравнения — пересчёт рейтинга запросом
+по daily_stats, как без инкрементального рейтинга. В конце рейтинг в
+памяти сверяется со счётом в challenge_members. Код возврата 1, если p99
+`/leaderboard` выше порога или рейтинг разошёлся с БД.
+
+    python -m tools.leaderboard_bench --members 10000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from datetime import timedelta
+
+CHAT_ID = -1
+FIRST_TELEGRAM_ID = 1_000_000
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def _describe(values: list[float]) -> str:
+    return (f'p50 {_percentile(values, 0.5) * 1000:.2f}ms, p99 {_percentile(values, 0.99) * 1000:.2f}ms, '
+            f'max {max(values, default=0) * 1000:.2f}ms')
+
+
+def fill_database(db_path: str, members: int, week_start, rng: random.Random) -> None:
+    """Участники с профилем и статистикой за все 7 дней недели; счёт — сумма сожжённых калорий"""
+    days = [week_start + timedelta(days=i) for i in range(7)]
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executemany(
+            'INSERT INTO users (id, telegram_id, weight, water_goal, calorie_goal) VALUES (?, ?, 70, 2000, 2000)',
+            ((i, FIRST_TELEGRAM_ID + i) for i in range(1, members + 1)),
+        )
+        scores = {}
+        stats = []
+        for user_id in range(1, members + 1):
+            burned = [rng.randint(0, 800) for _ in days]
+            scores[user_id] = float(sum(burned))
+            stats.extend((user_id, day.isoformat(), value) for day, value in zip(days, burned))
+        conn.executemany(
+            'INSERT INTO daily_stats (user_id, stat_date, total_water, water_goal, total_calories, '
+            'burned_calories, calorie_goal, total_protein, total_fat, total_carbs) '
+            'VALUES (?, ?, 0, 2000, 0, ?, 2000, 0, 0, 0)',
+            stats,
+        )
+        challenge_id = conn.execute(
+            "INSERT INTO challenges (chat_id, metric, week_start) VALUES (?, 'burned', ?) RETURNING id",
+            (CHAT_ID, week_start.isoformat()),
+        ).fetchone()[0]
+        conn.executemany(
+            'INSERT INTO challenge_members (challenge_id, user_id, name, score) VALUES (?, ?, ?, ?)',
+            ((challenge_id, user_id, f'участник {user_id}', score) for user_id, score in scores.items()),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+async def bench(args: argparse.Namespace) -> int:
+    workdir = tempfile.mkdtemp(prefix='leaderboard-bench-')
+    db_path = os.path.join(workdir, 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite+aiosqlite:///{db_path}'
+    os.environ['ADMIN_IDS'] = ''
+
+    # Модули бота читают настройки при импорте, поэтому импортируются здесь
+    from aiogram import Bot
+    from sqlalchemy import text
+
+    import main
+    from database.engine import engine, init_db, session_maker
+    from services.challenges import registry
+    from services.http import close_session
+    from tools.soak import make_stub_session, make_update
+
+    rng = random.Random(args.seed)
+    await init_db()
+    started = time.perf_counter()
+    await asyncio.to_thread(fill_database, db_path, args.members, registry.week, rng)
+    print(f'Filled {args.members} members in {time.perf_counter() - started:.1f}s')
+
+    started = time.perf_counter()
+    await registry.load(session_maker)
+    print(f'Challenge load at startup: {(time.perf_counter() - started) * 1000:.0f}ms')
+
+    challenge = registry.current(CHAT_ID)
+    board = challenge.board
+    user_ids = range(1, args.members + 1)
+
+    started = time.perf_counter()
+    for _ in range(args.ops):
+        board.rank(rng.choice(user_ids))
+        board.top(10)
+    print(f'In-memory rank + top-10: {(time.perf_counter() - started) / args.ops * 1e6:.1f}us per request')
+
+    main.setup_dispatcher()
+    bot = Bot(token='42:BENCH', session=make_stub_session())
+    update_id = 1
+
+    async def feed(telegram_id: int, text: str, chat_id: int | None = None) -> float:
+        nonlocal update_id
+        update_id += 1
+        started = time.perf_counter()
+        await main.dp.feed_update(bot, make_update(update_id, telegram_id, text, chat_id))
+        return time.perf_counter() - started
+
+    naive_query = text(
+        'SELECT d.user_id, SUM(d.burned_calories) AS score FROM daily_stats d '
+        'JOIN challenge_members m ON m.user_id = d.user_id AND m.challenge_id = :challenge_id '
+        'WHERE d.stat_date >= :week_start GROUP BY d.user_id ORDER BY score DESC'
+    )
+
+    try:
+        leaderboard = [await feed(FIRST_TELEGRAM_ID + rng.choice(user_ids), '/leaderboard', CHAT_ID)
+                       for _ in range(args.requests)]
+        workouts = [await feed(FIRST_TELEGRAM_ID + rng.choice(user_ids), '/log_workout бег 30')
+                    for _ in range(args.requests)]
+
+        naive = []
+        params = {'challenge_id': challenge.id, 'week_start': challenge.week_start}
+        for _ in range(args.naive_requests):
+            started = time.perf_counter()
+            async with session_maker() as session:
+                (await session.execute(naive_query, params)).all()
+            naive.append(time.perf_counter() - started)
+
+        async with session_maker() as session:
+            stored = dict((await session.execute(
+                text('SELECT user_id, score FROM challenge_members WHERE challenge_id = :id'), {'id': challenge.id}
+            )).all())
+    finally:
+        await close_session()
+        await engine.dispose()
+
+    print(f'/leaderboard via handlers: {_describe(leaderboard)}')
+    print(f'/log_workout via handlers (rating update included): {_describe(workouts)}')
+    print(f'Recompute by scanning daily_stats: {_describe(naive)}')
+
+    failures = []
+    mismatched = [user_id for user_id, score in stored.items() if board.score(user_id) != score]
+    if mismatched or len(board) != len(stored):
+        failures.append(f'{len(mismatched)} in-memory scores differ from challenge_members')
+    p99 = _percentile(leaderboard, 0.99) * 1000
+    if p99 > args.max_leaderboard_ms:
+        failures.append(f'/leaderboard p99 {p99:.1f}ms (limit {args.max_leaderboard_ms:.0f}ms)')
+
+    if failures:
+        print('\nFAILED:\n  ' + '\n  '.join(failures))
+        return 1
+
+    print('\nOK')
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Challenge leaderboard benchmark')
+    parser.add_argument('--members', type=int, default=10_000)
+    parser.add_argument('--ops', type=int, default=10_000, help='операций рейтинга в памяти')
+    parser.add_argument('--requests', type=int, default=500, help='обновлений /leaderboard и /log_workout')
+    parser.add_argument('--naive-requests', type=int, default=20, help='пересчётов рейтинга запросом')
+    parser.add_argument('--max-leaderboard-ms', type=float, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger('aiogram.event').setLevel(logging.WARNING)
+    sys.exit(asyncio.run(bench(parse_args())))
@@ -0,0 +1,266 @@
+"""
+Микробенчмарк доступа к БД в горячих хэндлерах: ORM против Core.
+
+Для каждой команды повторяет работу хэндлера с БД двумя способами:
+ORM — как до `database/queries.py` (загрузка `User`, объекты логов через
+`session.add`, `get_or_create_daily_stats` и изменение атрибутов, flush при
+коммите) и Core — функциями `database.queries`, как сейчас. Ответ в Telegram
+и челленджи не входят, они одинаковы для обоих путей.
+
+На команду выводятся CPU потока event loop (то, что ORM добавляет к
+обработке обновления; SQLite работает в потоке aiosqlite), CPU процесса,
+wall-время и пик аллокаций (tracemalloc, отдельный проход). Код возврата 1,
+если Core-путь какой-либо команды тратит CPU потока event loop больше ORM.
+
+    python -m tools.orm_bench --iterations 2000 --users 50
+"""
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from dataclasses import dataclass
+from datetime import date
+
+WATER_AMOUNT = 250
+FOOD = {'food_name': 'банан', 'calories_per_100g': 89.0, 'protein': 1.1, 'fat': 0.3, 'carbs': 22.8}
+FOOD_AMOUNT = 150.0
+WORKOUT_MET = 8.0
+WORKOUT_MINUTES = 30
+
+
+@dataclass
+class Result:
+    loop_cpu: float
+    process_cpu: float
+    wall: float
+    peak_alloc: float = 0.0
+
+
+def orm_commands() -> dict:
+    from sqlalchemy import select
+
+    from database.models import FoodLog, User, WaterLog, WorkoutLog
+    from database.stats_cache import CachedStats
+    from database.utils import get_or_create_daily_stats
+
+    async def get_user(session, telegram_id: int) -> User:
+        result = await session.execute(select(User).where(User.telegram_id == telegram_id))
+        return result.scalar_one_or_none()
+
+    async def log_water(session, telegram_id: int, today: date) -> CachedStats:
+        user = await get_user(session, telegram_id)
+        session.add(WaterLog(user_id=user.id, amount=WATER_AMOUNT, log_date=today))
+        stats = await get_or_create_daily_stats(session, user.id, today)
+        stats.total_water += WATER_AMOUNT
+        await session.commit()
+        return CachedStats.from_row(stats)
+
+    async def log_food(session, telegram_id: int, today: date) -> CachedStats:
+        # В хэндлере id пользователя берётся из FSM, без запроса users
+        user_id = telegram_id
+        ratio = FOOD_AMOUNT / 100
+        session.add(FoodLog(
+            user_id=user_id,
+            food_name=FOOD['food_name'],
+            calories=FOOD['calories_per_100g'] * ratio,
+            amount=FOOD_AMOUNT,
+            protein=FOOD['protein'] * ratio,
+            fat=FOOD['fat'] * ratio,
+            carbs=FOOD['carbs'] * ratio,
+            log_date=today,
+        ))
+        stats = await get_or_create_daily_stats(session, user_id, today)
+        stats.total_calories += FOOD['calories_per_100g'] * ratio
+        stats.total_protein += FOOD['protein'] * ratio
+        stats.total_fat += FOOD['fat'] * ratio
+        stats.total_carbs += FOOD['carbs'] * ratio
+        await session.commit()
+        return CachedStats.from_row(stats)
+
+    async def log_workout(session, telegram_id: int, today: date) -> CachedStats:
+        user = await get_user(session, telegram_id)
+        calories_burned = WORKOUT_MET * user.weight * (WORKOUT_MINUTES / 60)
+        water_needed = int((WORKOUT_MINUTES / 30) * 200)
+        session.add(WorkoutLog(
+            user_id=user.id,
+            workout_type='бег',
+            duration=WORKOUT_MINUTES,
+            calories_burned=calories_burned,
+            water_needed=water_needed,
+            log_date=today,
+        ))
+        stats = await get_or_create_daily_stats(session, user.id, today)
+        stats.burned_calories += calories_burned
+        stats.water_goal += water_needed
+        await session.commit()
+        return CachedStats.from_row(stats)
+
+    async def check_progress(session, telegram_id: int, today: date) -> CachedStats:
+        user = await get_user(session, telegram_id)
+        stats = await get_or_create_daily_stats(session, user.id, today)
+        await session.commit()
+        return CachedStats.from_row(stats)
+
+    return {'log_water': log_water, 'log_food': log_food, 'log_workout': log_workout,
+            'check_progress': check_progress}
+
+
+def core_commands() -> dict:
+    from database.queries import (
+        add_food_log,
+        add_to_daily_stats,
+        add_water_log,
+        add_workout_log,
+        get_daily_stats,
+        get_user_brief,
+    )
+    from database.stats_cache import CachedStats
+
+    async def log_water(session, telegram_id: int, today: date) -> CachedStats:
+        user = await get_user_brief(session, telegram_id)
+        await add_water_log(session, user.id, WATER_AMOUNT, today)
+        stats = await add_to_daily_stats(session, user.id, today, water=WATER_AMOUNT)
+        await session.commit()
+        return CachedStats.from_row(stats)
+
+    async def log_food(session, telegram_id: int, today: date) -> CachedStats:
+        user_id = telegram_id
+        ratio = FOOD_AMOUNT / 100
+        calories = FOOD['calories_per_100g'] * ratio
+        protein, fat, carbs = FOOD['protein'] * ratio, FOOD['fat'] * ratio, FOOD['carbs'] * ratio
+        await add_food_log(
+            session, user_id=user_id, food_name=FOOD['food_name'], calories=calories, amount=FOOD_AMOUNT,
+            protein=protein, fat=fat, carbs=carbs, log_date=today,
+        )
+        stats = await add_to_daily_stats(
+            session, user_id, today, calories=calories, protein=protein, fat=fat, carbs=carbs
+        )
+        await session.commit()
+        return CachedStats.from_row(stats)
+
+    async def log_workout(session, telegram_id: int, today: date) -> CachedStats:
+        user = await get_user_brief(session, telegram_id)
+        calories_burned = WORKOUT_MET * user.weight * (WORKOUT_MINUTES / 60)
+        water_needed = int((WORKOUT_MINUTES / 30) * 200)
+        await add_workout_log(
+            session, user_id=user.id, workout_type='бег', duration=WORKOUT_MINUTES,
+            calories_burned=calories_burned, water_needed=water_needed, log_date=today,
+        )
+        stats = await add_to_daily_stats(session, user.id, today, burned=calories_burned, water_goal=water_needed)
+        await session.commit()
+        return CachedStats.from_row(stats)
+
+    async def check_progress(session, telegram_id: int, today: date) -> CachedStats:
+        user = await get_user_brief(session, telegram_id)
+        stats = await get_daily_stats(session, user.id, today)
+        if stats is None:
+            stats = await add_to_daily_stats(session, user.id, today)
+            await session.commit()
+        return CachedStats.from_row(stats)
+
+    return {'log_water': log_water, 'log_food': log_food, 'log_workout': log_workout,
+            'check_progress': check_progress}
+
+
+async def create_users(session_maker, count: int) -> None:
+    """Пользователи с telegram_id == id, чтобы log_food мог обойтись без запроса users"""
+    from sqlalchemy import insert
+
+    from database.models import User
+
+    async with session_maker() as session:
+        await session.execute(insert(User), [
+            {'id': i, 'telegram_id': i, 'weight': 70.0, 'water_goal': 2000, 'calorie_goal': 2000}
+            for i in range(1, count + 1)
+        ])
+        await session.commit()
+
+
+async def run_command(session_maker, command, iterations: int, users: int, trace: bool) -> Result:
+    today = date.today()
+    loop_cpu = process_cpu = wall = peak = 0.0
+    gc.collect()
+    for i in range(iterations):
+        telegram_id = i % users + 1
+        if trace:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        started = (time.thread_time(), time.process_time(), time.perf_counter())
+        async with session_maker() as session:
+            await command(session, telegram_id, today)
+        loop_cpu += time.thread_time() - started[0]
+        process_cpu += time.process_time() - started[1]
+        wall += time.perf_counter() - started[2]
+        if trace:
+            peak += tracemalloc.get_traced_memory()[1] - base
+    return Result(loop_cpu / iterations, process_cpu / iterations, wall / iterations, peak / iterations)
+
+
+async def bench(args: argparse.Namespace) -> int:
+    workdir = tempfile.mkdtemp(prefix='orm-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    # Модули бота читают настройки при импорте, поэтому импортируются здесь
+    from database.engine import engine, init_db, session_maker
+
+    await init_db()
+    await create_users(session_maker, args.users)
+    paths = {'orm': orm_commands(), 'core': core_commands()}
+
+    results: dict[tuple[str, str], Result] = {}
+    try:
+        for name in paths['core']:
+            for path in ('orm', 'core'):
+                command = paths[path][name]
+                # Прогрев: кэши скомпилированных запросов и строки daily_stats за сегодня
+                await run_command(session_maker, command, args.warmup, args.users, trace=False)
+                result = await run_command(session_maker, command, args.iterations, args.users, trace=False)
+
+                tracemalloc.start()
+                traced = await run_command(session_maker, command, args.alloc_iterations, args.users, trace=True)
+                tracemalloc.stop()
+                result.peak_alloc = traced.peak_alloc
+                results[name, path] = result
+    finally:
+        await engine.dispose()
+
+    print(f'{args.iterations} iterations per command, {args.users} users\n')
+    print(f"{'command':<16}{'path':<6}{'loop CPU':>11}{'proc CPU':>11}{'wall':>11}{'peak alloc':>13}")
+    failures = []
+    for name in paths['core']:
+        for path in ('orm', 'core'):
+            r = results[name, path]
+            print(f'{name:<16}{path:<6}{r.loop_cpu * 1e6:>9.0f}us{r.process_cpu * 1e6:>9.0f}us'
+                  f'{r.wall * 1e6:>9.0f}us{r.peak_alloc / 1024:>10.1f}KB')
+        orm, core = results[name, 'orm'], results[name, 'core']
+        print(f"{'':<16}{'':<6}{orm.loop_cpu / core.loop_cpu:>10.2f}x{orm.process_cpu / core.process_cpu:>10.2f}x"
+              f'{orm.wall / core.wall:>10.2f}x{orm.peak_alloc / max(core.peak_alloc, 1):>12.2f}x\n')
+        if core.loop_cpu > orm.loop_cpu:
+            failures.append(f'{name}: core loop CPU {core.loop_cpu * 1e6:.0f}us > orm {orm.loop_cpu * 1e6:.0f}us')
+
+    if failures:
+        print('FAILED:\n  ' + '\n  '.join(failures))
+        return 1
+
+    print('OK')
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='ORM vs Core micro-benchmark for hot handlers')
+    parser.add_argument('--iterations', type=int, default=2000, help='замеров CPU на команду и путь')
+    parser.add_argument('--alloc-iterations', type=int, default=300, help='замеров аллокаций (tracemalloc)')
+    parser.add_argument('--warmup', type=int, default=200)
+    parser.add_argument('--users', type=int, default=50)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(bench(parse_args())))
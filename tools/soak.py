@@ -0,0 +1,415 @@
+"""
+Soak-тест бота: долгий синтетический трафик через настоящие роутеры.
+
+Telegram Bot API и внешние сервисы (OpenFoodFacts, OpenWeatherMap) заменены
+заглушками, БД — временный файл SQLite. Фото штрихкодов скачиваются из
+заглушки Bot API и распознаются в пуле процессов, если доступен pyzbar.
+Во время прогона периодически снимаются показатели процесса (tracemalloc,
+RSS, файловые дескрипторы, соединения пула БД и HTTP-сессии, лаг event loop). Прогон падает с кодом 1, если рост
+после прогрева превышает пороги.
+
+Ускоренный режим (6 часов трафика за 10 минут):
+
+    python -m tools.soak --duration 600 --simulated-hours 6
+"""
+import argparse
+import asyncio
+import functools
+import itertools
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+# Вместо текста отправляется фото штрихкода
+PHOTO = '<photo>'
+
+# Команды одного пользователя и их относительная частота
+COMMANDS = [
+    (['/log_water 250'], 5),
+    (['/log_food банан', '150'], 3),
+    ([PHOTO, '150'], 1),
+    (['/log_workout бег 30'], 1),
+    (['/check_progress'], 3),
+]
+
+# Штрихкоды на фото; заглушка OpenFoodFacts не знает коды с последней цифрой 0
+BARCODE_COUNT = 40
+PROFILE_FLOW = ['/set_profile', '70', '175', '30', '45', 'Москва']
+
+# Сколько команд пользователь отправляет за час «реального» времени
+COMMANDS_PER_USER_HOUR = 6
+
+
+@dataclass
+class Sample:
+    elapsed: float
+    updates: int
+    traced: int
+    rss: int
+    fds: int
+    db_connections: int
+    http_connections: int
+    lag_p99: float
+
+
+@dataclass
+class SoakState:
+    updates: int = 0
+    errors: int = 0
+    lag: list[float] = field(default_factory=list)
+    # Тики, начатые раньше, не учитываются в лаге
+    lag_since: float = 0.0
+    samples: list[Sample] = field(default_factory=list)
+
+
+async def start_stub_upstreams() -> 'web.AppRunner':
+    """Локальная заглушка OpenFoodFacts и OpenWeatherMap"""
+    from aiohttp import web
+
+    async def search(request: web.Request) -> web.Response:
+        return web.json_response({'products': [{
+            'product_name': request.query.get('search_terms', 'продукт'),
+            'nutriments': {
+                'energy-kcal_100g': 89,
+                'proteins_100g': 1.1,
+                'fat_100g': 0.3,
+                'carbohydrates_100g': 22.8,
+            },
+        }]})
+
+    async def product(request: web.Request) -> web.Response:
+        # Коды с последней цифрой 0 «неизвестны», как 404 у OpenFoodFacts
+        barcode = request.match_info['barcode']
+        if barcode.endswith('0'):
+            return web.json_response({'status': 0, 'status_verbose': 'product not found'}, status=404)
+        return web.json_response({'status': 1, 'product': {
+            'product_name': f'продукт {barcode}',
+            'nutriments': {'energy-kcal_100g': 250, 'proteins_100g': 8, 'fat_100g': 10, 'carbohydrates_100g': 30},
+        }})
+
+    async def weather(request: web.Request) -> web.Response:
+        return web.json_response({'main': {'temp': 22.0 + random.random() * 10}})
+
+    app = web.Application()
+    app.router.add_get('/cgi/search.pl', search)
+    app.router.add_get('/api/v2/product/{barcode}.json', product)
+    app.router.add_get('/weather', weather)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner
+
+
+def _read_rss() -> int:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def _count_fds() -> int:
+    return len(os.listdir('/proc/self/fd'))
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def measure_lag(state: SoakState, tick: float = 0.05) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + tick
+        await asyncio.sleep(tick)
+        if expected - tick >= state.lag_since:
+            state.lag.append(max(0.0, loop.time() - expected))
+
+
+@functools.lru_cache(maxsize=BARCODE_COUNT)
+def barcode_photo(code: str) -> bytes:
+    from tools.barcode_bench import render_ean13
+
+    return render_ean13(code)
+
+
+def make_stub_session():
+    """
+    Сессия aiogram, которая вместо Bot API возвращает правдоподобные ответы.
+
+    Файлы отдаются как JPEG со штрихкодом: file_id — это сам код.
+    """
+    from aiogram.client.session.base import BaseSession
+    from aiogram.methods import GetFile
+    from aiogram.types import Chat, File, Message
+
+    class StubSession(BaseSession):
+        def __init__(self):
+            super().__init__()
+            self.message_ids = itertools.count(1)
+            self.requests = 0
+
+        async def make_request(self, bot, method, timeout=None):
+            self.requests += 1
+            if method.__returning__ is bool:
+                return True
+            if isinstance(method, GetFile):
+                return File(file_id=method.file_id, file_unique_id=method.file_id,
+                            file_path=f'photos/{method.file_id}.jpg')
+            return Message(
+                message_id=next(self.message_ids),
+                date=datetime.now(),
+                chat=Chat(id=getattr(method, 'chat_id', 0) or 0, type='private'),
+                text=getattr(method, 'text', None),
+            ).as_(bot)
+
+        async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+            self.requests += 1
+            image = barcode_photo(url.rsplit('/', 1)[-1].removesuffix('.jpg'))
+            for start in range(0, len(image), chunk_size):
+                yield image[start:start + chunk_size]
+
+        async def close(self):
+            pass
+
+    return StubSession()
+
+
+def make_update(update_id: int, user_id: int, text: str, chat_id: int | None = None):
+    """Текстовое сообщение в личном чате или, если задан chat_id, в группе"""
+    from aiogram.types import Chat, Message, Update, User
+
+    chat = Chat(id=user_id, type='private') if chat_id is None else Chat(id=chat_id, type='group')
+    return Update(
+        update_id=update_id,
+        message=Message(
+            message_id=update_id,
+            date=datetime.now(),
+            chat=chat,
+            from_user=User(id=user_id, is_bot=False, first_name=f'soak{user_id}'),
+            text=text,
+        ),
+    )
+
+
+def make_photo_update(update_id: int, user_id: int, file_id: str):
+    """Фото в личном чате; file_id заглушка Bot API отдаёт как штрихкод"""
+    from aiogram.types import Chat, Message, PhotoSize, Update, User
+
+    return Update(
+        update_id=update_id,
+        message=Message(
+            message_id=update_id,
+            date=datetime.now(),
+            chat=Chat(id=user_id, type='private'),
+            from_user=User(id=user_id, is_bot=False, first_name=f'soak{user_id}'),
+            photo=[PhotoSize(file_id=file_id, file_unique_id=file_id, width=400, height=200)],
+        ),
+    )
+
+
+def photos_supported() -> bool:
+    try:
+        import pyzbar.pyzbar  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+async def run_user(user_id: int, dp, bot, state: SoakState, update_ids, deadline: float, interval: float,
+                   commands: list, barcodes: list[str]) -> None:
+    async def send(text: str):
+        if text == PHOTO:
+            update = make_photo_update(next(update_ids), user_id, random.choice(barcodes))
+        else:
+            update = make_update(next(update_ids), user_id, text)
+        try:
+            await dp.feed_update(bot, update)
+        except Exception:
+            state.errors += 1
+            logging.exception('Update failed for user %s', user_id)
+        state.updates += 1
+
+    for text in PROFILE_FLOW:
+        await send(text)
+
+    commands, weights = zip(*commands)
+    while time.monotonic() < deadline:
+        await asyncio.sleep(random.expovariate(1 / interval))
+        for text in random.choices(commands, weights)[0]:
+            await send(text)
+
+
+async def monitor(state: SoakState, started: float, interval: float, engine) -> None:
+    from services.http import open_connections
+
+    while True:
+        await asyncio.sleep(interval)
+        traced, _ = tracemalloc.get_traced_memory()
+        sample = Sample(
+            elapsed=time.monotonic() - started,
+            updates=state.updates,
+            traced=traced,
+            rss=_read_rss(),
+            fds=_count_fds(),
+            db_connections=engine.pool.checkedout(),
+            http_connections=open_connections(),
+            lag_p99=_percentile(state.lag, 0.99),
+        )
+        state.lag.clear()
+        state.samples.append(sample)
+        logging.info(
+            '[%5.0fs] updates=%d traced=%.1fMB rss=%.1fMB fds=%d db_conns=%d http_conns=%d lag_p99=%.1fms',
+            sample.elapsed, sample.updates, sample.traced / 2**20, sample.rss / 2**20,
+            sample.fds, sample.db_connections, sample.http_connections, sample.lag_p99 * 1000,
+        )
+
+
+async def soak(args: argparse.Namespace) -> int:
+    tracemalloc.start()
+
+    runner = await start_stub_upstreams()
+    port = runner.addresses[0][1]
+    workdir = tempfile.mkdtemp(prefix='soak-')
+
+    os.environ['DATABASE_URL'] = f"sqlite+aiosqlite:///{os.path.join(workdir, 'soak.db')}"
+    os.environ['OPENFOODFACTS_URL'] = f'http://127.0.0.1:{port}'
+    os.environ['OPENWEATHER_URL'] = f'http://127.0.0.1:{port}/weather'
+    os.environ['OPENWEATHER_API_KEY'] = 'soak'
+    os.environ['ADMIN_IDS'] = ''
+
+    # Модули бота читают настройки при импорте, поэтому импортируются здесь
+    from aiogram import Bot
+
+    import main
+    from database.engine import engine, init_db
+    from services import metrics
+    from services.barcode import shutdown_pool
+    from services.http import close_session
+    from tools.barcode_bench import ean13
+
+    await init_db()
+    main.setup_dispatcher()
+    bot = Bot(token='42:SOAK', session=make_stub_session())
+
+    commands = COMMANDS
+    if not photos_supported():
+        print('pyzbar is unavailable (libzbar missing): barcode photos are not soaked')
+        commands = [(texts, weight) for texts, weight in COMMANDS if PHOTO not in texts]
+    barcodes = [ean13(f'46000000{i:04d}') for i in range(BARCODE_COUNT)]
+
+    # Интервал между командами пользователя с учётом ускорения времени
+    speedup = args.simulated_hours * 3600 / args.duration
+    interval = 3600 / COMMANDS_PER_USER_HOUR / speedup
+
+    state = SoakState()
+    started = time.monotonic()
+    deadline = started + args.duration
+    update_ids = itertools.count(1)
+
+    lag_task = asyncio.create_task(measure_lag(state))
+    monitor_task = asyncio.create_task(monitor(state, started, args.sample_interval, engine))
+    baseline = None
+
+    try:
+        users = [
+            asyncio.create_task(run_user(user_id, dp=main.dp, bot=bot, state=state, update_ids=update_ids,
+                                         deadline=deadline, interval=interval, commands=commands,
+                                         barcodes=barcodes))
+            for user_id in range(1, args.users + 1)
+        ]
+        await asyncio.sleep(args.duration * args.warmup)
+        baseline = tracemalloc.take_snapshot()
+        # Снимок tracemalloc блокирует event loop, это не лаг бота
+        state.lag_since = asyncio.get_running_loop().time()
+        await asyncio.gather(*users)
+    finally:
+        monitor_task.cancel()
+        lag_task.cancel()
+        await close_session()
+        await shutdown_pool()
+        await runner.cleanup()
+        await engine.dispose()
+
+    final = tracemalloc.take_snapshot()
+    elapsed = time.monotonic() - started
+
+    print(f'\nSoak finished: {state.updates} updates in {elapsed:.0f}s '
+          f'({state.updates / elapsed:.0f}/s), {state.errors} errors, '
+          f'{bot.session.requests} Bot API calls')
+
+    # Сколько раз обновление обращалось к пулу БД и коммитило (см. middlewares/db.py)
+    updates = max(1, metrics.get('db_updates_total'))
+    print('DB per update: ' + ', '.join(
+        f"{name} {metrics.get(f'db_{name}_total') / updates:.2f}"
+        for name in ('sessions', 'checkouts', 'commits', 'rollbacks')
+    ))
+
+    print('\nTop allocation growth since warm-up:')
+    for stat in final.compare_to(baseline, 'lineno')[:args.top]:
+        print(f'  {stat}')
+
+    after_warmup = [s for s in state.samples if s.elapsed >= args.duration * args.warmup]
+    if len(after_warmup) < 2:
+        print('\nNot enough samples after warm-up to evaluate growth')
+        return 1
+
+    first, last = after_warmup[0], after_warmup[-1]
+    failures = []
+    growth_mb = (last.traced - first.traced) / 2**20
+    if growth_mb > args.max_growth_mb:
+        failures.append(f'traced memory grew by {growth_mb:.1f}MB (limit {args.max_growth_mb}MB)')
+    if last.fds - first.fds > args.max_fd_growth:
+        failures.append(f'open fds grew by {last.fds - first.fds} (limit {args.max_fd_growth})')
+    if last.db_connections - first.db_connections > args.max_conn_growth:
+        failures.append(f'checked-out DB connections grew to {last.db_connections}')
+    if last.http_connections - first.http_connections > args.max_conn_growth:
+        failures.append(f'open HTTP connections grew to {last.http_connections}')
+    worst_lag = max(s.lag_p99 for s in after_warmup) * 1000
+    if worst_lag > args.max_lag_ms:
+        failures.append(f'event loop lag p99 reached {worst_lag:.0f}ms (limit {args.max_lag_ms}ms)')
+    if state.errors:
+        failures.append(f'{state.errors} updates failed')
+
+    print(f'\nAfter warm-up: traced {growth_mb:+.1f}MB, rss {(last.rss - first.rss) / 2**20:+.1f}MB, '
+          f'fds {last.fds - first.fds:+d}, http conns {last.http_connections - first.http_connections:+d}, '
+          f'worst lag p99 {worst_lag:.0f}ms')
+
+    if failures:
+        print('\nFAILED:\n  ' + '\n  '.join(failures))
+        return 1
+
+    print('\nOK')
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Soak test for the bot')
+    parser.add_argument('--duration', type=float, default=600, help='реальная длительность, с')
+    parser.add_argument('--simulated-hours', type=float, default=6, help='сколько часов трафика сжать в прогон')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--sample-interval', type=float, default=10, help='период снятия показателей, с')
+    parser.add_argument('--warmup', type=float, default=0.1, help='доля прогона на прогрев')
+    parser.add_argument('--max-growth-mb', type=float, default=20)
+    parser.add_argument('--max-fd-growth', type=int, default=10)
+    parser.add_argument('--max-conn-growth', type=int, default=5, help='рост соединений пула БД и HTTP-сессии')
+    parser.add_argument('--max-lag-ms', type=float, default=200)
+    parser.add_argument('--top', type=int, default=10, help='сколько мест аллокаций показать')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(soak(parse_args())))
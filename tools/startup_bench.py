@@ -0,0 +1,190 @@
+"""
+Бенчмарк старта бота: время импорта по модулям и время до первого обновления.
+
+Импорт измеряется через `python -X importtime` в чистом процессе. Время до
+первого обновления — в дочернем процессе, который повторяет шаги `main.main()`
+(импорт, миграции, загрузка индексов, настройка диспетчера) и прогоняет одно
+обновление `/start` через заглушку Bot API. Дочерний процесс запускается на одной
+временной БД: сначала холодный старт (схема создаётся), затем несколько тёплых
+(версия схемы совпадает, DDL не выполняется). Код возврата 1, если тёплый старт
+дольше порога.
+
+    python -m tools.startup_bench --max-seconds 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from dataclasses import dataclass
+
+
+@dataclass
+class ImportTime:
+    module: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+
+def parse_importtime(output: str) -> list[ImportTime]:
+    """Разбирает вывод `-X importtime` (stderr)"""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # заголовок таблицы
+        name = parts[2].rstrip()
+        # Вложенность кодируется отступом по два пробела после разделителя
+        indent = len(name) - len(name.lstrip()) - 1
+        entries.append(ImportTime(
+            module=name.strip(),
+            depth=indent // 2,
+            self_us=int(parts[0]),
+            cumulative_us=int(parts[1]),
+        ))
+    return entries
+
+
+def _child_env(db_path: str) -> dict:
+    env = dict(os.environ)
+    env['DATABASE_URL'] = f'sqlite+aiosqlite:///{db_path}'
+    env['TOKEN'] = '42:BENCH'
+    env['ADMIN_IDS'] = ''
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    return env
+
+
+def measure_imports(db_path: str) -> list[ImportTime]:
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        env=_child_env(db_path), capture_output=True, text=True, check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+async def _first_update() -> dict:
+    """Выполняется в дочернем процессе: шаги старта бота и одно обновление"""
+    started = time.perf_counter()
+
+    from aiogram import Bot
+
+    import main
+    from database.engine import engine, init_db, session_maker
+    from database.migrations import SCHEMA_VERSION
+    from database.product_index import product_index
+    from services.challenges import registry as challenge_registry
+    from services.http import close_session
+    from tools.soak import make_stub_session, make_update
+
+    imported = time.perf_counter()
+    version = await init_db()
+    migrated = time.perf_counter()
+    await challenge_registry.load(session_maker)
+    await product_index.load(session_maker)
+    main.setup_dispatcher()
+    bot = Bot(token=os.environ['TOKEN'], session=make_stub_session())
+    ready = time.perf_counter()
+
+    await main.dp.feed_update(bot, make_update(1, 1, '/start'))
+    handled = time.perf_counter()
+    await close_session()
+    # Поток aiosqlite не демон: без dispose процесс не завершится
+    await engine.dispose()
+
+    return {
+        'schema_version_before': version,
+        'migrated': version != SCHEMA_VERSION,
+        'imports': imported - started,
+        'migrations': migrated - imported,
+        'ready': ready - started,
+        'first_update': handled - started,
+        'calls': bot.session.requests,
+    }
+
+
+def measure_first_update(db_path: str) -> dict:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-m', 'tools.startup_bench', '--child'],
+        env=_child_env(db_path), capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f'startup child failed:\n{result.stderr}')
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+    stats['process'] = wall
+    return stats
+
+
+def _print_imports(entries: list[ImportTime], top: int) -> float:
+    # Модули самого интерпретатора (site, encodings) в итог не входят
+    total = sum(e.cumulative_us for e in entries if e.depth == 0 and e.module == 'main') / 1e6
+    print(f'Import of main: {total * 1000:.0f}ms, {len(entries)} modules in process')
+    print(f'\nTop {top} modules by cumulative import time:')
+    print(f"  {'cumulative':>10} {'self':>8}  module")
+    for e in sorted(entries, key=lambda e: e.cumulative_us, reverse=True)[:top]:
+        print(f'  {e.cumulative_us / 1000:8.1f}ms {e.self_us / 1000:6.1f}ms  {e.module}')
+    return total
+
+
+def _print_run(label: str, stats: dict) -> None:
+    print(f"  {label:<5} process {stats['process'] * 1000:6.0f}ms | imports {stats['imports'] * 1000:5.0f}ms, "
+          f"migrations {stats['migrations'] * 1000:5.0f}ms (schema v{stats['schema_version_before']}"
+          f"{', applied' if stats['migrated'] else ', no DDL'}), ready {stats['ready'] * 1000:5.0f}ms, "
+          f"first update {stats['first_update'] * 1000:5.0f}ms")
+
+
+def bench(args: argparse.Namespace) -> int:
+    workdir = tempfile.mkdtemp(prefix='startup-')
+    db_path = os.path.join(workdir, 'bench.db')
+
+    import_total = _print_imports(measure_imports(os.path.join(workdir, 'imports.db')), args.top)
+
+    # Холодный старт создаёт схему, тёплые стартуют на уже мигрированной БД
+    print('\nTime to first update:')
+    cold = measure_first_update(db_path)
+    _print_run('cold', cold)
+    warm = [measure_first_update(db_path) for _ in range(args.runs)]
+    for stats in warm:
+        _print_run('warm', stats)
+
+    failures = []
+    best = min(s['first_update'] for s in warm)
+    if best > args.max_seconds:
+        failures.append(f'warm time to first update {best:.2f}s (limit {args.max_seconds}s)')
+    if any(s['migrated'] for s in warm):
+        failures.append('warm start ran migrations')
+    if args.max_import_seconds is not None and import_total > args.max_import_seconds:
+        failures.append(f'import of main took {import_total:.2f}s (limit {args.max_import_seconds}s)')
+
+    if failures:
+        print('\nFAILED:\n  ' + '\n  '.join(failures))
+        return 1
+
+    print('\nOK')
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Startup benchmark for the bot')
+    parser.add_argument('--runs', type=int, default=3, help='сколько тёплых стартов измерить')
+    parser.add_argument('--top', type=int, default=15, help='сколько модулей показать')
+    parser.add_argument('--max-seconds', type=float, default=2.0, help='порог времени до первого обновления')
+    parser.add_argument('--max-import-seconds', type=float, default=None, help='порог времени импорта main')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.child:
+        print(json.dumps(asyncio.run(_first_update())))
+        sys.exit(0)
+    sys.exit(bench(args))